@@ -2,32 +2,86 @@
 Flask application entry point
 """
 import os
+import click
 from flask import Flask, session, jsonify
 from flask_cors import CORS
 from config import config
-from models import db, init_db
+from models import db, init_db, upgrade_schema, DuplicateTasksError, TaskDailyCount
+from services.cache import result_cache
+from services.import_jobs import ImportJobService
+from services.job_progress import job_progress
+from services.parse_cache import parse_cache
+from utils.compression import init_compression
+from utils.instrumentation import init_instrumentation
+from utils.metrics import init_metrics
+from utils.serialization import FastJSONProvider
 from routes.api import api_bp
 from routes.admin import admin_bp
 
 
-def create_app(config_name='development'):
-    """Application factory"""
+def create_app(config_name='development', check_schema=True):
+    """
+    Application factory
+    check_schema=False starts on an out of date database (SCHEMA_CHECK=false, see manage.py)
+    """
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
 
     # Load configuration
     app.config.from_object(config[config_name])
 
     # Initialize extensions
-    CORS(app, origins=app.config['CORS_ORIGINS'], supports_credentials=True)
+    CORS(
+        app,
+        origins=app.config['CORS_ORIGINS'],
+        supports_credentials=True,
+        expose_headers=['ETag', 'Server-Timing', 'X-Start-Date', 'X-Days', 'X-Dtype', 'X-Departments']
+    )
     db.init_app(app)
+    result_cache.init_app(app)
+    parse_cache.init_app(app)
+    job_progress.init_app(app)
+    # Registered before compression so its after_request hook runs last
+    init_instrumentation(app)
+    init_metrics(app)
+    init_compression(app)
 
     # Initialize database
-    init_db(app)
+    init_db(app, check_schema)
+
+    # Fail import jobs lost with a previous worker
+    if check_schema:
+        with app.app_context():
+            ImportJobService.fail_stale_jobs()
 
     # Register blueprints
     app.register_blueprint(api_bp)
     app.register_blueprint(admin_bp)
 
+    @app.cli.command('rebuild-rollup')
+    def rebuild_rollup():
+        """Rebuild task_daily_counts from the tasks table"""
+        TaskDailyCount.rebuild()
+        result_cache.bump_version()
+        print('Rebuilt task_daily_counts rollup')
+
+    @app.cli.command('upgrade-db')
+    @click.option('--remove-duplicates', is_flag=True,
+                  help='Delete tasks duplicating an older task (same department, content and date)')
+    def upgrade_db(remove_duplicates):
+        """Migrate an existing database to the current schema (back it up first)"""
+        try:
+            result = upgrade_schema(remove_duplicates)
+        except DuplicateTasksError as e:
+            raise click.ClickException(str(e))
+
+        result_cache.bump_version()
+        print(f"Backfilled content_hash for {result['hashes_backfilled']} tasks, "
+              f"removed {result['duplicates_removed']} duplicates")
+        if result['rollup_rebuilt']:
+            print('Built task_daily_counts rollup')
+        print('Database schema is up to date')
+
     # Health check endpoint
     @app.route('/health')
     def health():
@@ -44,20 +98,32 @@ def create_app(config_name='development'):
             'version': '1.0.0',
             'endpoints': {
                 'public': {
-                    'GET /api/tasks': 'Get all tasks',
+                    'GET /api/tasks?limit=N&cursor=C&fields=F&department=D&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD': 'Get a page of tasks',
+                    'GET /api/tasks?export=json|ndjson': 'Stream all matching tasks',
                     'GET /api/tasks/by-date?year=YYYY': 'Get tasks grouped by date',
+                    'GET /api/tasks/by-date?year=YYYY&export=json|ndjson': 'Stream tasks grouped by date',
                     'GET /api/tasks/counts?year=YYYY': 'Get task counts per date',
+                    'GET /api/tasks/counts/departments?year=YYYY': 'Get task counts per department',
+                    'GET /api/tasks/counts/months?year=YYYY': 'Get task counts per month',
+                    'GET /api/tasks/counts/dense?year=YYYY&departments=1&format=json|binary': 'Get task counts per day of year as a dense array',
                     'GET /api/tasks/upcoming?limit=N': 'Get upcoming tasks',
                     'GET /api/tasks/date/<date>': 'Get tasks for specific date',
                     'GET /api/departments': 'Get all departments',
-                    'GET /api/stats': 'Get general statistics'
+                    'GET /api/stats': 'Get general statistics',
+                    'GET /api/search?q=Q&limit=N&offset=O&department=D': 'Search task content (accent-insensitive, ranked)',
+                    'GET|POST /api/batch?q=type:year,...': 'Run several dashboard queries in one request',
+                    'GET /metrics': 'Prometheus metrics (bearer token when METRICS_TOKEN is set)'
                 },
                 'admin': {
                     'POST /api/admin/login': 'Admin login',
                     'POST /api/admin/logout': 'Admin logout',
                     'GET /api/admin/me': 'Get current user',
-                    'POST /api/admin/import': 'Import tasks from Excel',
+                    'POST /api/admin/import': 'Queue import of tasks from Excel (several files, .zip or all_sheets=1 for every sheet, mode=delta to sync changed rows)',
+                    'GET /api/admin/import/jobs': 'Get recent import jobs',
+                    'GET /api/admin/import/jobs/<job_id>': 'Get import job progress',
                     'POST /api/admin/preview': 'Preview Excel before import',
+                    'GET /api/admin/cache': 'Get result and parse cache statistics',
+                    'GET|DELETE /api/admin/metrics': 'Get (or reset) per-route latency and query metrics',
                     'POST /api/admin/change-password': 'Change password'
                 }
             }
@@ -83,9 +149,13 @@ def create_app(config_name='development'):
 
 # Create app instance for gunicorn
 config_name = os.environ.get('FLASK_ENV', 'development')
-app = create_app(config_name)
 
 if __name__ == '__main__':
+    # Built here rather than at import time: the import parse workers
+    # (forkserver/spawn) re-import this module when it is run as a script.
+    # WSGI servers load the application from wsgi.py
+    app = create_app(config_name, check_schema=os.environ.get('SCHEMA_CHECK', 'true').lower() == 'true')
+
     # Get host and port from environment
     host = os.environ.get('FLASK_HOST', '0.0.0.0')
     # Railway uses PORT, fallback to FLASK_PORT or 5000
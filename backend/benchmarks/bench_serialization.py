@@ -0,0 +1,82 @@
+"""
+Benchmark bulk task serialization: Task.to_dict + stdlib json vs the
+column-tuple serializer + fast encoder used by TaskService
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py --rows 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import Task, db
+from services.task_service import TaskService, TASK_FIELDS
+from utils.serialization import serialize_rows, orjson
+
+
+def seed(rows):
+    """Insert synthetic tasks with Core executemany"""
+    start = date(2026, 1, 1)
+    now = datetime.utcnow()
+    db.session.execute(Task.__table__.insert(), [
+        {
+            'stt': i % 300,
+            'department': f'Phòng {i % 12}',
+            'content': f'Nội dung cảnh báo định kỳ số {i}',
+            'warning_date': start + timedelta(days=i % 365),
+            'content_hash': f'{i:064d}',
+            'created_at': now,
+            'updated_at': now
+        }
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def timed(label, func, repeat):
+    """Run func repeat times and print best wall time"""
+    best = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        size = len(func())
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{label:<45} {best * 1000:>10.1f} ms  ({size} bytes)')
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context():
+        seed(args.rows)
+        print(f'{args.rows} rows, orjson {"installed" if orjson else "not installed"}')
+
+        baseline = timed(
+            'ORM + Task.to_dict + json.dumps',
+            lambda: json.dumps([task.to_dict() for task in Task.query.all()]),
+            args.repeat
+        )
+        fast = timed(
+            'columns + serialize_rows + app.json.dumps',
+            lambda: app.json.dumps(serialize_rows(
+                TaskService._task_columns_query(TASK_FIELDS).all(), TASK_FIELDS
+            )),
+            args.repeat
+        )
+        print(f'speedup: {baseline / fast:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+"""
+Benchmark suite for the import pipeline, TaskService and the public API
+
+For each size a synthetic workbook is generated (see synthetic.py) and
+imported into a fresh SQLite database, then every TaskService method and
+every api blueprint route (through the Flask test client, with a cold and
+a warm cache) is timed. Every step runs in its own interpreter sharing
+the database file, so the peak RSS recorded for it is its own. Wall time,
+SQL query count and peak RSS of every step are written to a JSON
+baseline; pass --compare to diff against a previous baseline.
+
+Usage (from backend/):
+    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000 --output baseline.json
+    python benchmarks/run_benchmarks.py --sizes 1000000 --compare baseline.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+import config
+from app import create_app
+from models import db
+from services.batch_service import BatchService
+from services.cache import result_cache
+from services.excel_processor import ExcelProcessor
+from services.search_service import SearchService
+from services.task_service import TaskService
+from synthetic import get_workbook
+
+YEAR = 2026
+
+# TaskService calls to time: name -> callable
+SERVICE_CALLS = {
+    'get_all_tasks': lambda: TaskService.get_all_tasks(),
+    'get_tasks_page': lambda: TaskService.get_tasks_page(500),
+    'iter_tasks': lambda: sum(1 for _ in TaskService.iter_tasks()),
+    'get_tasks_by_date': lambda: TaskService.get_tasks_by_date(YEAR),
+    'get_upcoming_tasks': lambda: TaskService.get_upcoming_tasks(500),
+    'get_tasks_for_date': lambda: TaskService.get_tasks_for_date(f'{YEAR}-06-15'),
+    'get_task_counts_by_date': lambda: TaskService.get_task_counts_by_date(YEAR),
+    'get_task_counts_by_department': lambda: TaskService.get_task_counts_by_department(),
+    'get_task_counts_by_month': lambda: TaskService.get_task_counts_by_month(YEAR),
+    'get_dense_counts': lambda: TaskService.get_dense_counts(YEAR, True),
+    'count_tasks': lambda: TaskService.count_tasks(),
+    'get_departments': lambda: TaskService.get_departments(),
+    'get_date_range': lambda: TaskService.get_date_range(),
+    'get_dataset_stamp': lambda: TaskService.get_dataset_stamp(),
+    'get_stats': lambda: TaskService.get_stats(),
+    'search': lambda: SearchService.search(SearchService.parse_terms('số liệu'), 50),
+    'batch_dashboard': lambda: BatchService.run(BatchService.parse_queries([
+        {'type': 'counts', 'year': YEAR},
+        {'type': 'tasks_by_date', 'year': YEAR},
+        {'type': 'stats'},
+        {'type': 'departments'}
+    ]))
+}
+
+# URLs to request for each api blueprint rule
+ROUTE_URLS = {
+    '/api/tasks': ['/api/tasks', '/api/tasks?fields=id,department,warning_date',
+                   '/api/tasks?export=json', '/api/tasks?export=ndjson'],
+    '/api/tasks/by-date': [f'/api/tasks/by-date?year={YEAR}', f'/api/tasks/by-date?year={YEAR}&export=json'],
+    '/api/tasks/counts': [f'/api/tasks/counts?year={YEAR}'],
+    '/api/tasks/counts/departments': ['/api/tasks/counts/departments'],
+    '/api/tasks/counts/months': [f'/api/tasks/counts/months?year={YEAR}'],
+    '/api/tasks/counts/dense': [f'/api/tasks/counts/dense?year={YEAR}&departments=1&format=binary'],
+    '/api/tasks/upcoming': ['/api/tasks/upcoming'],
+    '/api/tasks/date/<date_str>': [f'/api/tasks/date/{YEAR}-06-15'],
+    '/api/departments': ['/api/departments'],
+    '/api/stats': ['/api/stats'],
+    '/api/search': ['/api/search?q=so%20lieu', '/api/search?q=thuy%20v'],
+    '/api/batch': [f'/api/batch?q=counts:{YEAR},tasks_by_date:{YEAR},stats,departments']
+}
+
+
+class QueryCounter:
+    """Count SQL statements executed on an engine"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def current_rss_kb():
+    """Resident size of this process, None where /proc isn't available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return None
+
+
+def peak_rss_kb():
+    """Peak resident size of this process (ru_maxrss is in bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def measure(counter, func):
+    """
+    Run func, returning wall time, query count and memory
+    peak_rss_kb is the peak resident size of the step's process (see
+    run_step) and rss_growth_kb how far it rose above the size the process
+    had when func was called
+    """
+    queries_before = counter.count
+    rss_before = current_rss_kb()
+
+    started = time.perf_counter()
+    func()
+    result = {
+        'wall_ms': round((time.perf_counter() - started) * 1000, 2),
+        'queries': counter.count - queries_before,
+        'peak_rss_kb': peak_rss_kb()
+    }
+
+    if rss_before is not None:
+        result['rss_growth_kb'] = max(0, result['peak_rss_kb'] - rss_before)
+    return result
+
+
+def make_config(directory):
+    """Testing config backed by a SQLite file in directory"""
+    class BenchmarkConfig(config.TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(directory, 'benchmark.db')
+        UPLOAD_FOLDER = os.path.join(directory, 'uploads')
+
+    return BenchmarkConfig
+
+
+def run_step(step, workbook, db_dir):
+    """
+    Run one step in a fresh interpreter (see step_worker)
+    ru_maxrss can't be reset and a forked child starts from the peak of
+    its parent, so a new process is the only way to get a per-step peak
+    """
+    spec = json.dumps({'step': step, 'workbook': workbook, 'db_dir': db_dir})
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--step', spec],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f'Benchmark step {step!r} failed:\n{proc.stderr}')
+    # The application may print to stdout while starting, the result is last
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def step_worker(spec):
+    """Measure one step against the database prepared by run_size"""
+    config.config['benchmark'] = make_config(spec['db_dir'])
+    app = create_app('benchmark')
+    step, workbook = spec['step'], spec['workbook']
+
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+        if step == 'parse_excel':
+            return measure(counter, lambda: ExcelProcessor().parse_excel(workbook))
+        if step == 'merge_tasks':
+            tasks = ExcelProcessor().parse_excel(workbook)
+            return measure(counter, lambda: ExcelProcessor().merge_tasks(tasks))
+        if step == 'stream_import_duplicates':
+            processor = ExcelProcessor()
+            return measure(counter, lambda: processor.merge_tasks(processor.iter_tasks(workbook)))
+
+        result_cache.bump_version()
+        if step.startswith('service.'):
+            return measure(counter, SERVICE_CALLS[step[len('service.'):]])
+
+        # route.cold <url> / route.warm <url>
+        temperature, url = step[len('route.'):].split(' ', 1)
+        client = app.test_client()
+        if temperature == 'warm':
+            client.get(url).get_data()
+        return measure(counter, lambda: client.get(url).get_data())
+
+
+def run_size(rows, workdir, verbose=True):
+    """Run every benchmark for one workbook size"""
+    results = {}
+    started = time.perf_counter()
+    workbook = get_workbook(os.path.join(workdir, 'workbooks'), rows, YEAR)
+    results['generate_workbook'] = {'wall_ms': round((time.perf_counter() - started) * 1000, 2)}
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        # Creates the database, the steps run in order against it
+        config.config['benchmark'] = make_config(db_dir)
+        app = create_app('benchmark')
+        with app.app_context():
+            db.engine.dispose()
+
+        steps = ['parse_excel', 'merge_tasks', 'stream_import_duplicates']
+        steps += [f'service.{name}' for name in SERVICE_CALLS]
+
+        api_rules = sorted(
+            rule.rule for rule in app.url_map.iter_rules()
+            if rule.endpoint.startswith('api.') and 'GET' in rule.methods
+        )
+        for rule in api_rules:
+            urls = ROUTE_URLS.get(rule)
+            if urls is None:
+                print(f'  warning: no benchmark URL for {rule}, requesting it bare')
+                urls = [rule]
+            for url in urls:
+                steps += [f'route.cold {url}', f'route.warm {url}']
+
+        for step in steps:
+            results[step] = run_step(step, workbook, db_dir)
+
+    if verbose:
+        for name, metrics in results.items():
+            memory = ''
+            if 'peak_rss_kb' in metrics:
+                memory = f"  {metrics['peak_rss_kb']:>8} kB peak RSS (+{metrics.get('rss_growth_kb', '?')} kB)"
+            print(f"  {name:<75} {metrics['wall_ms']:>10.1f} ms  {metrics.get('queries', '-'):>4} queries{memory}")
+
+    return results
+
+
+def compare(current, previous, threshold, min_delta_ms):
+    """
+    Print wall time changes against a previous baseline, returns number of regressions
+    A step regresses when it is both threshold relatively and min_delta_ms slower
+    """
+    regressions = 0
+
+    for size, results in current['results'].items():
+        old_results = previous.get('results', {}).get(size)
+        if not old_results:
+            continue
+
+        print(f'\nComparison for {size} rows (threshold {threshold:.0%}):')
+        for name, metrics in results.items():
+            old = old_results.get(name)
+            if not old or not old.get('wall_ms'):
+                continue
+
+            ratio = metrics['wall_ms'] / old['wall_ms']
+            flag = ''
+            if ratio > 1 + threshold and metrics['wall_ms'] - old['wall_ms'] >= min_delta_ms:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f"  {name:<75} {old['wall_ms']:>10.1f} -> {metrics['wall_ms']:>10.1f} ms ({ratio:.2f}x){flag}")
+
+    return regressions
+
+
+def git_commit():
+    """Current git commit hash, None outside a checkout"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark import pipeline, TaskService and API routes')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='Comma separated row counts (e.g. 1000,10000,100000,1000000)')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write results')
+    parser.add_argument('--compare', help='Previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative slowdown reported as regression (default 0.2)')
+    parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                        help='Ignore slowdowns smaller than this many ms (default 5)')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'eptc-benchmarks'),
+                        help='Directory for generated workbooks (reused between runs)')
+    # Internal: run a single step (see run_step)
+    parser.add_argument('--step', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        print(json.dumps(step_worker(json.loads(args.step))))
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    output = {
+        'commit': git_commit(),
+        'created_at': datetime.utcnow().isoformat(),
+        'python': sys.version.split()[0],
+        'results': {}
+    }
+
+    for rows in sizes:
+        print(f'Benchmarking {rows} rows...')
+        output['results'][str(rows)] = run_size(rows, args.workdir)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+    print(f'\nResults written to {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        regressions = compare(output, previous, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f'\n{regressions} regression(s) found')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Synthetic workbooks in the eptc_canhbaocodinh.xlsx layout
+
+Row 1 is empty, row 2 holds the headers (STT, Phòng chủ trì, Nội dung
+cảnh báo, Ngày cảnh báo) and data starts on row 3. Like the real file,
+a numbered item spans several rows: only its first row carries STT (the
+rest behave like a merged cell) and follow-up rows often have no date.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+import openpyxl
+
+HEADERS = ('STT', 'Phòng chủ trì', 'Nội dung cảnh báo', 'Ngày cảnh báo')
+DEPARTMENTS = ['P1', 'P2', 'P3', 'P4', 'P5', 'P6', 'P7', 'P8', 'Các phòng phối hợp']
+PHRASES = [
+    'gửi công văn yêu cầu các đơn vị cung cấp số liệu',
+    'trình Lãnh đạo Công ty ban hành Chương trình năm sau',
+    'hoàn thành tổng hợp số liệu thủy văn quá khứ và trình phê duyệt',
+    'rà soát, kiến nghị đưa ra khỏi Chương trình những văn bản chưa hoàn thành',
+    'cập nhật tiến độ & thông số kỹ thuật công trình nguồn mới'
+]
+
+
+def generate_workbook(path, rows, year=2026, seed=42):
+    """Write a workbook with `rows` data rows (write-only mode, flat memory)"""
+    rng = random.Random(seed)
+    start = datetime(year, 1, 1)
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append([None, None, None, None])
+    ws.append(list(HEADERS))
+
+    stt = 0
+    written = 0
+    while written < rows:
+        stt += 1
+        department = rng.choice(DEPARTMENTS)
+        group_size = min(rng.choice((1, 1, 1, 2, 3, 5)), rows - written)
+
+        for position in range(group_size):
+            content = f'- {department} {rng.choice(PHRASES)} (mục {stt}.{position + 1})'
+            has_date = position == 0 or rng.random() < 0.3
+            warning_date = start + timedelta(days=rng.randrange(365)) if has_date else None
+            ws.append([
+                stt if position == 0 else None,
+                department if position == 0 or rng.random() < 0.5 else None,
+                content,
+                warning_date
+            ])
+            written += 1
+
+    wb.save(path)
+    return path
+
+
+def get_workbook(directory, rows, year=2026):
+    """Get path of a synthetic workbook, generating it once per size"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'synthetic_{rows}.xlsx')
+    if not os.path.exists(path):
+        generate_workbook(path, rows, year)
+    return path
@@ -18,6 +18,31 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'database.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Engine profile
+    # Server databases (PostgreSQL) get a bounded, pre-pinged connection pool;
+    # per worker process, so gunicorn -w 4 opens up to 4 * (size + overflow)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds
+    SQLALCHEMY_ENGINE_OPTIONS = {} if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True
+    }
+
+    # SQLite connections run these pragmas on connect: WAL lets dashboard
+    # reads continue while an import writes, busy_timeout (ms) makes
+    # concurrent writers wait instead of failing with 'database is locked'
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 10000)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes
+    }
+
     # Session configuration
     SESSION_TYPE = 'filesystem'
     PERMANENT_SESSION_LIFETIME = timedelta(hours=1)
@@ -29,6 +54,68 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
+    # Single-file uploads are parsed from memory up to this size, larger
+    # ones spill to an anonymous temporary file
+    UPLOAD_SPOOL_MAX_SIZE = int(os.environ.get('UPLOAD_SPOOL_MAX_SIZE', 4 * 1024 * 1024))  # bytes
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+
+    # Parsed workbooks keyed by the upload's SHA-256, so a preview followed
+    # by an import of the same file parses it once
+    PARSE_CACHE_ENABLED = True
+    PARSE_CACHE_DIR = os.environ.get('PARSE_CACHE_DIR') or os.path.join(basedir, 'parse_cache')
+    PARSE_CACHE_TTL = int(os.environ.get('PARSE_CACHE_TTL', 24 * 3600))  # seconds
+
+    # Background import jobs (worker threads per gunicorn process)
+    IMPORT_ASYNC = True
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 1))
+    # Running jobs publish progress here (a SQLite side database shared by
+    # the worker processes) while their task writes stay uncommitted
+    IMPORT_PROGRESS_PATH = os.environ.get('IMPORT_PROGRESS_PATH') or os.path.join(basedir, 'import_progress.db')
+    # Jobs queued or running for longer are marked failed (on startup and when polled)
+    IMPORT_JOB_TIMEOUT = int(os.environ.get('IMPORT_JOB_TIMEOUT', 3600))  # seconds
+
+    # Multi-file imports (several workbooks or zip archives, every sheet)
+    # Sheets are parsed in IMPORT_PARSE_WORKERS processes (default: CPU count)
+    IMPORT_ARCHIVE_EXTENSIONS = {'zip'}
+    IMPORT_PARSE_WORKERS = int(os.environ.get('IMPORT_PARSE_WORKERS', 0)) or None
+    IMPORT_PARSE_START_METHOD = 'forkserver'  # falls back to spawn where unavailable
+    IMPORT_MAX_FILES = int(os.environ.get('IMPORT_MAX_FILES', 50))
+    IMPORT_MAX_UNCOMPRESSED_SIZE = 200 * 1024 * 1024  # 200MB extracted from archives
+    # A parse worker returns a sheet's rows at once, larger sheets are rejected
+    IMPORT_MAX_SHEET_ROWS = int(os.environ.get('IMPORT_MAX_SHEET_ROWS', 200000))
+
+    # Result cache for public read endpoints
+    # 'sqlite' shares entries and the dataset version between gunicorn workers,
+    # 'memory' keeps a per-process cache only
+    CACHE_ENABLED = True
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite')
+    CACHE_PATH = os.environ.get('CACHE_PATH') or os.path.join(basedir, 'cache.db')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 256))
+    CACHE_SHARED_MAX_ENTRIES = int(os.environ.get('CACHE_SHARED_MAX_ENTRIES', 1024))
+
+    # Response compression (gzip, brotli when the package is installed)
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # bytes
+    COMPRESS_LEVEL = 6
+    COMPRESS_MIMETYPES = {'application/json', 'application/x-ndjson', 'application/octet-stream'}
+
+    # Per-request instrumentation (query counts, per-route latency histograms)
+    INSTRUMENTATION_ENABLED = True
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
+
+    # Prometheus metrics at /metrics, each worker process writes its
+    # metrics to METRICS_DIR where they are merged when scraped
+    METRICS_ENABLED = True
+    METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(basedir, 'metrics')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))  # seconds
+    # Scrapers send 'Authorization: Bearer <METRICS_TOKEN>', otherwise an admin session is required
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Pagination for task list endpoints
+    TASKS_PAGE_SIZE = int(os.environ.get('TASKS_PAGE_SIZE', 500))
+    TASKS_MAX_PAGE_SIZE = int(os.environ.get('TASKS_MAX_PAGE_SIZE', 5000))
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 50))
+    SEARCH_MAX_PAGE_SIZE = int(os.environ.get('SEARCH_MAX_PAGE_SIZE', 500))
 
     # CORS configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', '*').split(',')
@@ -63,6 +150,12 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    CACHE_BACKEND = 'memory'
+    IMPORT_ASYNC = False
+    IMPORT_PROGRESS_PATH = None
+    METRICS_ENABLED = False
+    PARSE_CACHE_ENABLED = False
 
 
 # Configuration dictionary
@@ -0,0 +1,13 @@
+"""
+Maintenance entry point for the Flask CLI
+Unlike app.py and wsgi.py it starts on a database whose schema is out of date, so
+migrations can run before the server is started:
+
+    flask --app manage upgrade-db [--remove-duplicates]
+    flask --app manage rebuild-rollup
+"""
+import os
+
+os.environ['SCHEMA_CHECK'] = 'false'
+
+from wsgi import app  # noqa: E402
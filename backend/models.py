@@ -1,25 +1,68 @@
 """
 Database models for the application
 """
+import hashlib
+import json
+import uuid
 from flask_sqlalchemy import SQLAlchemy
+from collections import Counter
+from sqlalchemy import event, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 import bcrypt
+from utils.helpers import fold_text
 
 db = SQLAlchemy()
 
 
+def _keyset_indexes(name, *columns):
+    """
+    Indexes in the keyset pagination order (warning_date NULLS FIRST, id)
+    SQLite sorts NULLs first already and rejects NULLS FIRST in an index,
+    PostgreSQL sorts them last, so an ASC index can't serve the order there
+    """
+    return (
+        db.Index(name, *columns, 'warning_date', 'id').ddl_if(
+            callable_=lambda ddl, target, bind, **kw: kw['dialect'].name != 'postgresql'
+        ),
+        db.Index(name, *columns, db.text('warning_date NULLS FIRST'), 'id').ddl_if(dialect='postgresql'),
+    )
+
+
 class Task(db.Model):
     """Task/Warning model"""
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # Keyset pagination order, optionally filtered by department
+        *_keyset_indexes('ix_tasks_warning_date_id'),
+        *_keyset_indexes('ix_tasks_department_warning_date_id', 'department'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     stt = db.Column(db.Integer, nullable=True)  # Số thứ tự từ Excel
     department = db.Column(db.String(200), nullable=False, index=True)  # Phòng chủ trì
     content = db.Column(db.Text, nullable=False)  # Nội dung cảnh báo
     warning_date = db.Column(db.Date, nullable=True, index=True)  # Ngày cảnh báo
+    # SHA-256 of department|content|date, used for deduplication on import
+    content_hash = db.Column(db.String(64), nullable=True, unique=True, index=True)
+    # Accent-folded department and content, indexed for full-text search
+    search_text = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    @staticmethod
+    def make_content_hash(department, content, warning_date):
+        """Create fixed-width deduplication hash for a task"""
+        date_str = warning_date.isoformat() if warning_date else 'no_date'
+        key = f"{department}|{content}|{date_str}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_search_text(department, content):
+        """Create the accent-folded text indexed for full-text search"""
+        return fold_text(f"{department} {content}")
+
     def to_dict(self):
         """Convert task to dictionary"""
         return {
@@ -36,6 +79,57 @@ class Task(db.Model):
         return f'<Task {self.id}: {self.department} - {self.warning_date}>'
 
 
+# Fills task_daily_counts from the tasks table
+ROLLUP_REBUILD = text(
+    'INSERT INTO task_daily_counts (warning_date, department, count) '
+    'SELECT warning_date, department, COUNT(*) FROM tasks '
+    'WHERE warning_date IS NOT NULL GROUP BY warning_date, department'
+)
+
+
+class TaskDailyCount(db.Model):
+    """Rollup of task counts per (warning_date, department), maintained on import"""
+    __tablename__ = 'task_daily_counts'
+
+    warning_date = db.Column(db.Date, primary_key=True)
+    department = db.Column(db.String(200), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def apply(rows, sign=1):
+        """
+        Add (or with sign=-1 subtract) tasks to the rollup in the current transaction
+        rows is an iterable of (warning_date, department), undated tasks are ignored
+        """
+        counts = Counter((row[0], row[1]) for row in rows if row[0] is not None)
+        if not counts:
+            return
+
+        table = TaskDailyCount.__table__
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=['warning_date', 'department'],
+            set_={'count': table.c.count + statement.excluded['count']}
+        )
+        db.session.execute(statement, [
+            {'warning_date': warning_date, 'department': department, 'count': sign * count}
+            for (warning_date, department), count in counts.items()
+        ])
+
+        if sign < 0:
+            db.session.execute(table.delete().where(table.c.count <= 0))
+
+    @staticmethod
+    def rebuild():
+        """Recompute the whole rollup from the tasks table (repair)"""
+        db.session.execute(TaskDailyCount.__table__.delete())
+        db.session.execute(ROLLUP_REBUILD)
+        db.session.commit()
+
+    def __repr__(self):
+        return f'<TaskDailyCount {self.warning_date} {self.department}: {self.count}>'
+
+
 class User(db.Model):
     """User model for authentication"""
     __tablename__ = 'users'
@@ -73,11 +167,396 @@ class User(db.Model):
         return f'<User {self.username} ({self.role})>'
 
 
-def init_db(app):
-    """Initialize database and create default admin user"""
+class ImportJob(db.Model):
+    """Background Excel import job"""
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)  # Saved upload, empty when held in memory
+    file_digest = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 of a single-workbook upload
+    dataset_stamp = db.Column(db.String(64), nullable=True)  # Tasks table stamp when the job finished
+    mode = db.Column(db.String(10), default='merge')  # merge (add new rows) or delta (sync the workbook's scope)
+    status = db.Column(db.String(20), default='queued', index=True)  # queued, running, completed, failed
+    rows_parsed = db.Column(db.Integer, default=0)
+    rows_inserted = db.Column(db.Integer, default=0)
+    duplicates_skipped = db.Column(db.Integer, default=0)
+    invalid_rows = db.Column(db.Integer, default=0)
+    stats = db.Column(db.Text, nullable=True)  # JSON stats of the finished import
+    errors = db.Column(db.Text, nullable=True)  # JSON list of row errors
+    error = db.Column(db.Text, nullable=True)  # Failure message
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @staticmethod
+    def progress_from_stats(stats):
+        """Progress counters of ExcelProcessor stats"""
+        return {
+            'rows_parsed': stats['total_rows'],
+            'rows_inserted': stats['new_records'],
+            'duplicates_skipped': stats['duplicates_skipped'],
+            'invalid_rows': stats['invalid_rows']
+        }
+
+    def update_progress(self, stats):
+        """Copy progress counters from ExcelProcessor stats"""
+        for key, value in ImportJob.progress_from_stats(stats).items():
+            setattr(self, key, value)
+
+    def to_dict(self, progress=None):
+        """
+        Convert job to dictionary
+        progress replaces the stored counters (live progress of a running job)
+        """
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'file_digest': self.file_digest,
+            'mode': self.mode,
+            'status': self.status,
+            'progress': progress or {
+                'rows_parsed': self.rows_parsed,
+                'rows_inserted': self.rows_inserted,
+                'duplicates_skipped': self.duplicates_skipped,
+                'invalid_rows': self.invalid_rows
+            },
+            'stats': json.loads(self.stats) if self.stats else None,
+            'errors': json.loads(self.errors) if self.errors else [],
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        return f'<ImportJob {self.id}: {self.status}>'
+
+
+# Columns and indexes added to existing tables after their first release
+REQUIRED_COLUMNS = {
+    'tasks': ('content_hash', 'search_text'),
+    'import_jobs': ('mode', 'file_digest', 'dataset_stamp')
+}
+REQUIRED_INDEXES = (
+    'ix_tasks_content_hash',
+    'ix_tasks_warning_date_id',
+    'ix_tasks_department_warning_date_id',
+    'ix_import_jobs_file_digest'
+)
+SEARCH_INDEX = 'search index'
+
+# Keyset pagination indexes: name -> leading columns (see _keyset_indexes)
+KEYSET_INDEXES = {
+    'ix_tasks_warning_date_id': '',
+    'ix_tasks_department_warning_date_id': 'department, '
+}
+
+
+class DuplicateTasksError(RuntimeError):
+    """Existing tasks share a content hash and upgrade_schema wasn't allowed to remove them"""
+
+
+def schema_problems():
+    """
+    Compare the database with the models without changing anything
+    Returns list of missing columns/indexes (empty when up to date)
+    """
+    inspector = db.inspect(db.engine)
+    problems = []
+
+    for table, required in REQUIRED_COLUMNS.items():
+        columns = {column['name'] for column in inspector.get_columns(table)}
+        problems.extend(f'{table}.{column}' for column in required if column not in columns)
+
+    with db.engine.connect() as conn:
+        indexes = _index_names(conn)
+        problems.extend(f'index {name}' for name in REQUIRED_INDEXES if name not in indexes)
+        problems.extend(f'index {name} (NULLS FIRST)' for name in sorted(_stale_keyset_indexes(conn)))
+        if not _has_search_index(conn, indexes):
+            problems.append(SEARCH_INDEX)
+
+        # Rollup introduced after tasks were imported
+        rollup_empty = not conn.execute(text('SELECT 1 FROM task_daily_counts LIMIT 1')).first()
+        if rollup_empty and conn.execute(text('SELECT 1 FROM tasks WHERE warning_date IS NOT NULL LIMIT 1')).first():
+            problems.append('task_daily_counts rollup')
+
+    return problems
+
+
+def _index_names(conn):
+    """Names of all indexes of the database"""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        return {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    if dialect == 'postgresql':
+        return {row[0] for row in conn.execute(text(
+            'SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()'
+        ))}
+
+    inspector = db.inspect(conn)
+    return {index['name'] for table in inspector.get_table_names() for index in inspector.get_indexes(table)}
+
+
+def _has_search_index(conn, indexes):
+    """Check for the full-text index created by create_search_index"""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        return conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'"
+        )).first() is not None
+    if dialect == 'postgresql':
+        return 'ix_tasks_search_text' in indexes
+    return True
+
+
+def upgrade_schema(remove_duplicates=False):
+    """
+    Bring an existing database up to date with the models
+    One-off migration run by `flask --app manage upgrade-db`, never at
+    startup. Adds tasks.content_hash and backfills it for existing rows,
+    then creates the unique index; duplicate tasks are only removed
+    (keeping the oldest) with remove_duplicates, otherwise
+    DuplicateTasksError is raised and nothing is changed.
+    Adds and backfills tasks.search_text and creates the search index,
+    (re)creates the keyset pagination indexes (NULLS FIRST on PostgreSQL),
+    adds the mode and upload digest columns of import_jobs and fills the
+    daily rollup when it is empty.
+    Everything runs in one transaction
+    Returns dictionary: { 'hashes_backfilled', 'duplicates_removed', 'rollup_rebuilt' }
+    """
+    inspector = db.inspect(db.engine)
+    columns = {column['name'] for column in inspector.get_columns('tasks')}
+    job_columns = {column['name'] for column in inspector.get_columns('import_jobs')}
+    result = {'hashes_backfilled': 0, 'duplicates_removed': 0, 'rollup_rebuilt': False}
+
+    with db.engine.begin() as conn:
+        # Refuse before altering anything, SQLite doesn't roll back DDL
+        _check_duplicates(conn, remove_duplicates, text(
+            'SELECT COALESCE(SUM(n - 1), 0) FROM ('
+            'SELECT COUNT(*) AS n FROM tasks GROUP BY department, content, warning_date) AS groups'
+        ))
+
+        if 'content_hash' not in columns:
+            conn.execute(text('ALTER TABLE tasks ADD COLUMN content_hash VARCHAR(64)'))
+        if 'search_text' not in columns:
+            conn.execute(text('ALTER TABLE tasks ADD COLUMN search_text TEXT'))
+        if 'mode' not in job_columns:
+            conn.execute(text("ALTER TABLE import_jobs ADD COLUMN mode VARCHAR(10) DEFAULT 'merge'"))
+        if 'file_digest' not in job_columns:
+            conn.execute(text('ALTER TABLE import_jobs ADD COLUMN file_digest VARCHAR(64)'))
+        if 'dataset_stamp' not in job_columns:
+            conn.execute(text('ALTER TABLE import_jobs ADD COLUMN dataset_stamp VARCHAR(64)'))
+
+        # Backfill hashes in batches
+        while True:
+            rows = conn.execute(text(
+                'SELECT id, department, content, warning_date FROM tasks '
+                'WHERE content_hash IS NULL LIMIT 1000'
+            )).fetchall()
+            if not rows:
+                break
+
+            conn.execute(
+                text('UPDATE tasks SET content_hash = :content_hash WHERE id = :id'),
+                [
+                    {
+                        'id': row.id,
+                        'content_hash': Task.make_content_hash(
+                            row.department,
+                            row.content,
+                            _as_date(row.warning_date)
+                        )
+                    }
+                    for row in rows
+                ]
+            )
+            result['hashes_backfilled'] += len(rows)
+
+        duplicates = _check_duplicates(conn, remove_duplicates, text(
+            'SELECT COUNT(*) - COUNT(DISTINCT content_hash) FROM tasks'
+        ))
+        if duplicates:
+            result['duplicates_removed'] = conn.execute(text(
+                'DELETE FROM tasks WHERE id NOT IN ('
+                'SELECT MIN(id) FROM tasks GROUP BY content_hash)'
+            )).rowcount
+
+        conn.execute(text(
+            'CREATE UNIQUE INDEX IF NOT EXISTS ix_tasks_content_hash ON tasks (content_hash)'
+        ))
+        _create_keyset_indexes(conn)
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_import_jobs_file_digest ON import_jobs (file_digest)'
+        ))
+
+        # Backfill search text in batches
+        while True:
+            rows = conn.execute(text(
+                'SELECT id, department, content FROM tasks '
+                'WHERE search_text IS NULL LIMIT 1000'
+            )).fetchall()
+            if not rows:
+                break
+
+            conn.execute(
+                text('UPDATE tasks SET search_text = :search_text WHERE id = :id'),
+                [
+                    {'id': row.id, 'search_text': Task.make_search_text(row.department, row.content)}
+                    for row in rows
+                ]
+            )
+
+        create_search_index(conn)
+
+        # Fill the rollup the first time it is deployed on existing data
+        if not conn.execute(text('SELECT 1 FROM task_daily_counts LIMIT 1')).first():
+            conn.execute(ROLLUP_REBUILD)
+            result['rollup_rebuilt'] = True
+
+    return result
+
+
+def _create_keyset_indexes(conn):
+    """Create the keyset pagination indexes, recreating PostgreSQL ones made without NULLS FIRST"""
+    nulls_first = ' NULLS FIRST' if conn.dialect.name == 'postgresql' else ''
+    stale = _stale_keyset_indexes(conn)
+
+    for name, leading in KEYSET_INDEXES.items():
+        if name in stale:
+            conn.execute(text(f'DROP INDEX {name}'))
+        conn.execute(text(
+            f'CREATE INDEX IF NOT EXISTS {name} ON tasks ({leading}warning_date{nulls_first}, id)'
+        ))
+
+
+def _stale_keyset_indexes(conn):
+    """Names of keyset pagination indexes of a PostgreSQL database lacking NULLS FIRST"""
+    if conn.dialect.name != 'postgresql':
+        return set()
+
+    rows = conn.execute(text(
+        "SELECT indexname, indexdef FROM pg_indexes "
+        "WHERE schemaname = current_schema() AND tablename = 'tasks'"
+    ))
+    return {name for name, definition in rows if name in KEYSET_INDEXES and 'NULLS FIRST' not in definition}
+
+
+def _check_duplicates(conn, remove_duplicates, count_query):
+    """Count duplicate tasks, raising DuplicateTasksError when there are some and removing isn't allowed"""
+    duplicates = conn.execute(count_query).scalar()
+    if duplicates and not remove_duplicates:
+        raise DuplicateTasksError(
+            f'{duplicates} tasks duplicate another task (same department, content and date). '
+            'Back up the database and rerun with --remove-duplicates to keep only the oldest of each'
+        )
+    return duplicates
+
+
+def create_search_index(conn):
+    """
+    Create the full-text index over tasks.search_text
+    SQLite: an external-content FTS5 table kept in sync by triggers, so
+    every write path (imports, deletes) updates it in the same transaction.
+    PostgreSQL: a GIN index on the search_text tsvector
+    """
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        conn.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_tasks_search_text ON tasks '
+            "USING GIN (to_tsvector('simple', coalesce(search_text, '')))"
+        ))
+        return
+
+    if dialect != 'sqlite':
+        return
+
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'"
+    )).first()
+    if exists:
+        return
+
+    conn.execute(text(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5('
+        "search_text, content='tasks', content_rowid='id', prefix='2 3')"
+    ))
+    conn.execute(text(
+        'CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN '
+        'INSERT INTO tasks_fts (rowid, search_text) VALUES (new.id, new.search_text); END'
+    ))
+    conn.execute(text(
+        'CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN '
+        "INSERT INTO tasks_fts (tasks_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); END"
+    ))
+    conn.execute(text(
+        'CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF search_text ON tasks BEGIN '
+        "INSERT INTO tasks_fts (tasks_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+        'INSERT INTO tasks_fts (rowid, search_text) VALUES (new.id, new.search_text); END'
+    ))
+    # Index the tasks that already exist
+    conn.execute(text("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')"))
+
+
+def dialect_insert(table):
+    """Get INSERT construct supporting ON CONFLICT for the current database"""
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        return postgresql_insert(table)
+    if dialect == 'sqlite':
+        return sqlite_insert(table)
+
+    raise ValueError(f"Unsupported database: {dialect}")
+
+
+def _as_date(value):
+    """Convert a raw DATE column value (SQLite returns strings) to date"""
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], '%Y-%m-%d').date()
+    return value
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run PRAGMA statements on every new SQLite connection of engine"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+def init_db(app, check_schema=True):
+    """
+    Initialize database and create default admin user
+    Creates missing tables (a new database is complete after this) but
+    never migrates existing data: when the schema is out of date the app
+    refuses to start until `flask --app manage upgrade-db` has been run
+    (check_schema=False lets that command start)
+    """
     with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS'))
         db.create_all()
 
+        problems = schema_problems()
+        # A new database only lacks the search index, which create_all can't make
+        if problems == [SEARCH_INDEX] and not db.session.query(Task.query.exists()).scalar():
+            with db.engine.begin() as conn:
+                create_search_index(conn)
+            problems = schema_problems()
+
+        if problems and check_schema:
+            raise RuntimeError(
+                f"Database schema is out of date (missing: {', '.join(problems)}). "
+                'Back up the database and run: flask --app manage upgrade-db'
+            )
+
         # Create default admin user if not exists
         admin = User.query.filter_by(username=app.config['DEFAULT_ADMIN_USERNAME']).first()
         if not admin:
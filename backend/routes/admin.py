@@ -5,7 +5,11 @@ from flask import Blueprint, jsonify, request, session
 from models import User, db
 from auth import admin_required
 from services.excel_processor import ExcelProcessor
-from utils.helpers import save_uploaded_file, cleanup_file
+from services.cache import result_cache
+from services.parse_cache import parse_cache
+from services.import_jobs import IMPORT_MODES, ImportJobService
+from utils.instrumentation import route_metrics, LATENCY_BUCKETS_MS
+from utils.helpers import allowed_file, file_digest, spool_upload, save_uploaded_files, cleanup_file
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -91,7 +95,14 @@ def get_current_user():
 def import_tasks():
     """
     Import tasks from Excel file
-    Expects multipart/form-data with 'file' field
+    Expects multipart/form-data with 'file' field. Several 'file' fields,
+    .zip archives or all_sheets=1 import every sheet of every workbook,
+    parsed in parallel worker processes. A single workbook already
+    previewed isn't parsed again, one already imported is skipped
+    mode=delta makes existing tasks of the workbook's departments and
+    date range match it (inserting, updating and removing rows) instead
+    of only adding new ones
+    Returns 202 with a job to poll at /api/admin/import/jobs/<job_id>
     """
     try:
         # Check if file is present
@@ -101,54 +112,83 @@ def import_tasks():
                 'error': 'No file provided'
             }), 400
 
-        file = request.files['file']
+        files = [file for file in request.files.getlist('file') if file.filename]
 
-        if file.filename == '':
+        if not files:
             return jsonify({
                 'success': False,
                 'error': 'No file selected'
             }), 400
 
-        # Save uploaded file
-        file_path = save_uploaded_file(file)
+        mode = request.form.get('mode', 'merge').lower()
+        if mode not in IMPORT_MODES:
+            return jsonify({
+                'success': False,
+                'error': f"Invalid mode. Expected one of: {', '.join(IMPORT_MODES)}"
+            }), 400
 
-        if not file_path:
+        multi_file = (
+            len(files) > 1 or
+            request.form.get('all_sheets', '').lower() in ('1', 'true', 'yes') or
+            any(file.filename.lower().endswith('.zip') for file in files)
+        )
+
+        # A single workbook is parsed from memory, a multi-file import is
+        # saved as a directory its parse worker processes read from
+        upload = None
+        digest = None
+        if multi_file:
+            file_path = save_uploaded_files(files)
+        else:
+            upload, digest = spool_upload(files[0])
+            file_path = ''
+
+        if not file_path and upload is None:
             return jsonify({
                 'success': False,
-                'error': 'Invalid file type. Only .xlsx and .xls files are allowed'
+                'error': 'Invalid file type. Only .xlsx, .xls and .zip files are allowed'
             }), 400
 
-        # Process Excel file
-        processor = ExcelProcessor()
+        filename = ', '.join(file.filename for file in files)[:255]
 
+        # Queue import job, it runs in the background thread pool
         try:
-            # Parse Excel
-            tasks = processor.parse_excel(file_path)
-
-            if not tasks:
-                return jsonify({
-                    'success': False,
-                    'error': 'No valid tasks found in Excel file',
-                    'errors': processor.get_errors()
-                }), 400
-
-            # Merge with existing data
-            stats = processor.merge_tasks(tasks)
+            job = ImportJobService.create_job(file_path, filename, session.get('user_id'), digest, mode)
+            ImportJobService.submit(job, upload)
+        except Exception as e:
+            db.session.rollback()
+            if upload is not None:
+                upload.close()
+            else:
+                cleanup_file(file_path)
+            raise e
 
-            # Clean up uploaded file
-            cleanup_file(file_path)
+        db.session.refresh(job)
 
+        if job.status == 'queued' or job.status == 'running':
             return jsonify({
                 'success': True,
-                'message': 'Import completed successfully',
-                'stats': stats,
-                'errors': processor.get_errors()
-            })
+                'message': 'Import queued',
+                'job': job.to_dict()
+            }), 202
 
-        except Exception as e:
-            # Clean up on error
-            cleanup_file(file_path)
-            raise e
+        # Job ran inline (IMPORT_ASYNC disabled)
+        if job.status == 'failed':
+            return jsonify({
+                'success': False,
+                'error': job.error,
+                'errors': job.to_dict()['errors'],
+                'job': job.to_dict()
+            }), 400
+
+        return jsonify({
+            'success': True,
+            'message': 'Import completed successfully',
+            'stats': job.to_dict()['stats'],
+            'dataset_version': result_cache.get_version(),
+            'errors': job.to_dict()['errors'],
+            'job': job.to_dict()
+        })
 
     except Exception as e:
         return jsonify({
@@ -157,12 +197,49 @@ def import_tasks():
         }), 500
 
 
+@admin_bp.route('/import/jobs', methods=['GET'])
+@admin_required
+def get_import_jobs():
+    """
+    Get recent import jobs
+    Query params:
+        - limit: Number of jobs to return (default 20)
+    """
+    limit = request.args.get('limit', 20, type=int)
+    jobs = ImportJobService.get_recent_jobs(limit)
+
+    return jsonify({
+        'success': True,
+        'jobs': [ImportJobService.describe(job) for job in jobs]
+    })
+
+
+@admin_bp.route('/import/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_import_job(job_id):
+    """Get status and progress of an import job"""
+    job = ImportJobService.get_job(job_id)
+
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Import job not found'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'job': ImportJobService.describe(job)
+    })
+
+
 @admin_bp.route('/preview', methods=['POST'])
 @admin_required
 def preview_import():
     """
     Preview Excel file before import
-    Returns statistics about the file without saving to database
+    Returns statistics about the file without saving to database. The
+    parsed tasks are kept in the parse cache for the following import,
+    already_imported tells if importing the file would change nothing
     """
     try:
         if 'file' not in request.files:
@@ -179,54 +256,45 @@ def preview_import():
                 'error': 'No file selected'
             }), 400
 
-        # Save uploaded file temporarily
-        file_path = save_uploaded_file(file)
-
-        if not file_path:
+        if not allowed_file(file.filename):
             return jsonify({
                 'success': False,
                 'error': 'Invalid file type'
             }), 400
 
-        # Parse Excel (without saving to DB)
+        # Parse Excel straight from the upload stream (without saving to disk or DB)
+        digest = file_digest(file.stream)
         processor = ExcelProcessor()
+        tasks = list(processor.iter_cached_tasks(file.stream, digest))
+
+        # Get preview statistics
+        departments = set()
+        dates = []
+
+        for task in tasks:
+            departments.add(task['department'])
+            if task['warning_date']:
+                dates.append(task['warning_date'])
+
+        preview_data = {
+            'total_tasks': len(tasks),
+            'departments': sorted(list(departments)),
+            'total_departments': len(departments),
+            'date_range': {
+                'min': min(dates).isoformat() if dates else None,
+                'max': max(dates).isoformat() if dates else None
+            },
+            'sample_tasks': tasks[:5],  # First 5 tasks as sample
+            'digest': digest,
+            'already_imported': ImportJobService.find_unchanged_import(digest) is not None
+        }
 
-        try:
-            tasks = processor.parse_excel(file_path)
-
-            # Get preview statistics
-            departments = set()
-            dates = []
-
-            for task in tasks:
-                departments.add(task['department'])
-                if task['warning_date']:
-                    dates.append(task['warning_date'])
-
-            preview_data = {
-                'total_tasks': len(tasks),
-                'departments': sorted(list(departments)),
-                'total_departments': len(departments),
-                'date_range': {
-                    'min': min(dates).isoformat() if dates else None,
-                    'max': max(dates).isoformat() if dates else None
-                },
-                'sample_tasks': tasks[:5]  # First 5 tasks as sample
-            }
-
-            # Clean up
-            cleanup_file(file_path)
-
-            return jsonify({
-                'success': True,
-                'preview': preview_data,
-                'stats': processor.get_stats(),
-                'errors': processor.get_errors()
-            })
-
-        except Exception as e:
-            cleanup_file(file_path)
-            raise e
+        return jsonify({
+            'success': True,
+            'preview': preview_data,
+            'stats': processor.get_stats(),
+            'errors': processor.get_errors()
+        })
 
     except Exception as e:
         return jsonify({
@@ -235,6 +303,34 @@ def preview_import():
         }), 500
 
 
+@admin_bp.route('/cache', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    """Get result cache statistics (hits, misses, entries, dataset version) and parse cache usage"""
+    return jsonify({
+        'success': True,
+        'cache': result_cache.get_stats(),
+        'parse_cache': parse_cache.get_stats()
+    })
+
+
+@admin_bp.route('/metrics', methods=['GET', 'DELETE'])
+@admin_required
+def get_request_metrics():
+    """
+    Get per-route latency histograms and SQL query counts of this worker
+    DELETE resets the recorded metrics
+    """
+    if request.method == 'DELETE':
+        route_metrics.reset()
+
+    return jsonify({
+        'success': True,
+        'buckets_ms': list(LATENCY_BUCKETS_MS),
+        'routes': route_metrics.get_stats()
+    })
+
+
 @admin_bp.route('/change-password', methods=['POST'])
 @admin_required
 def change_password():
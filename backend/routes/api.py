@@ -1,22 +1,207 @@
 """
 Public API routes for tasks
 """
-from flask import Blueprint, jsonify, request
+import hashlib
+import sys
+from array import array
+from urllib.parse import quote
+from datetime import date, datetime, timezone
+from functools import wraps
+from flask import Blueprint, jsonify, request, current_app
 from services.task_service import TaskService
+from services.batch_service import BatchService
+from services.search_service import SearchService
+from services.cache import result_cache
+from utils.compression import negotiate_encoding, is_compressible, compress, apply_encoding
+from utils.streaming import ndjson_response, json_list_response, json_grouped_response
+
+EXPORT_FORMATS = ('json', 'ndjson')
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
 
+def conditional(daily=False):
+    """
+    Decorator adding ETag / Last-Modified validators to a read endpoint
+    Validators come from the dataset version, so a matching
+    If-None-Match / If-Modified-Since is answered with 304 before the
+    view runs any TaskService query. Last-Modified is the time of the
+    last version bump (every import, including deletes) or the newest
+    updated_at, whichever is later.
+    Set daily=True for views whose result also depends on today's date
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Validators only make sense for GET, other methods carry a body
+            if request.method != 'GET':
+                return f(*args, **kwargs)
+
+            stamp = TaskService.get_dataset_stamp()
+            version, changed_at = result_cache.get_version_info()
+            parts = [
+                str(version),
+                str(stamp['total_tasks']),
+                stamp['last_modified'] or '',
+                request.full_path
+            ]
+            if daily:
+                parts.append(date.today().isoformat())
+            etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+            last_modified = None
+            if not daily:
+                last_modified = datetime.fromtimestamp(changed_at, timezone.utc)
+                if stamp['last_modified']:
+                    last_modified = max(last_modified, datetime.fromisoformat(stamp['last_modified']).replace(
+                        microsecond=0, tzinfo=timezone.utc
+                    ))
+
+            encoding = negotiate_encoding()
+
+            if request.if_none_match:
+                # The tag the client holds tells which representation it has
+                validated = next((
+                    tag for tag in (etag, f'{etag}-gzip', f'{etag}-br')
+                    if request.if_none_match.contains(tag)
+                ), None)
+                not_modified = validated is not None
+            else:
+                not_modified = bool(
+                    last_modified and request.if_modified_since and
+                    last_modified <= request.if_modified_since
+                )
+                validated = compressed_etag(etag, encoding) if not_modified else None
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+                response.set_etag(validated)
+            else:
+                response = render_response(f, args, kwargs, etag, encoding)
+                if response.status_code != 200:
+                    return response
+
+            if last_modified:
+                response.last_modified = last_modified
+            response.vary.add('Accept-Encoding')
+            # Let browsers keep the body but revalidate on every use
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
+
+
+def compressed_etag(etag, encoding):
+    """ETag of the body a 200 would send: suffixed only when a compressed body is cached for it"""
+    if encoding:
+        found, _ = result_cache.get_local(('compressed-response', etag, encoding))
+        if found:
+            return f'{etag}-{encoding}'
+    return etag
+
+
+def render_response(f, args, kwargs, etag, encoding):
+    """
+    Run view and set its ETag, reusing a cached compressed body when possible
+    Compressed bodies are kept per (ETag, encoding) for the current dataset
+    version together with the headers the view set (e.g. the X-* layout
+    headers of the dense counts), so repeat hits skip both the
+    query/serialization and compression
+    """
+    key = ('compressed-response', etag, encoding)
+
+    if encoding:
+        found, cached_body = result_cache.get_local(key)
+        if found:
+            body, mimetype, headers = cached_body
+            response = current_app.response_class(mimetype=mimetype, headers=headers)
+            response.set_etag(etag)
+            return apply_encoding(response, body, encoding)
+
+    response = current_app.make_response(f(*args, **kwargs))
+    if response.status_code != 200:
+        return response
+
+    response.set_etag(etag)
+    if encoding and is_compressible(response):
+        headers = [
+            (name, value) for name, value in response.headers
+            if name not in ('Content-Type', 'Content-Length', 'ETag')
+        ]
+        body = compress(response.get_data(), encoding)
+        result_cache.put_local(key, (body, response.mimetype, headers))
+        apply_encoding(response, body, encoding)
+
+    return response
+
+
+def get_page_size():
+    """Read 'limit' query param, clamped to the configured page size bounds"""
+    limit = request.args.get('limit', type=int) or current_app.config['TASKS_PAGE_SIZE']
+    return max(1, min(limit, current_app.config['TASKS_MAX_PAGE_SIZE']))
+
+
+def get_export_format():
+    """Read 'export' query param, None when the response should not be streamed"""
+    export = request.args.get('export')
+    if export and export not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid export format, expected one of: {', '.join(EXPORT_FORMATS)}")
+    return export
+
+
 @api_bp.route('/tasks', methods=['GET'])
+@conditional()
 def get_tasks():
-    """Get all tasks"""
+    """
+    Get tasks, one page at a time
+    Query params:
+        - limit: Page size (optional)
+        - cursor: next_cursor from the previous page (optional)
+        - fields: Comma separated fields to return, e.g. id,department,warning_date (optional)
+        - department: Filter by department (optional)
+        - date_from, date_to: Filter by warning date, format YYYY-MM-DD (optional)
+        - export: 'json' or 'ndjson' streams every matching task instead of a page (optional)
+    total is the number of matching tasks (over all pages)
+    """
     try:
-        tasks = TaskService.get_all_tasks()
+        fields = request.args.get('fields')
+        fields = tuple(f.strip() for f in fields.split(',') if f.strip()) if fields else None
+        export = get_export_format()
+
+        if export:
+            rows = TaskService.iter_tasks(
+                fields=fields,
+                department=request.args.get('department'),
+                date_from=request.args.get('date_from'),
+                date_to=request.args.get('date_to')
+            )
+            if export == 'ndjson':
+                return ndjson_response(rows)
+            return json_list_response('tasks', rows)
+
+        filters = {
+            'department': request.args.get('department'),
+            'date_from': request.args.get('date_from'),
+            'date_to': request.args.get('date_to')
+        }
+        page = TaskService.get_tasks_page(
+            get_page_size(),
+            cursor=request.args.get('cursor'),
+            fields=fields,
+            **filters
+        )
+
         return jsonify({
             'success': True,
-            'tasks': tasks,
-            'total': len(tasks)
+            'tasks': page['tasks'],
+            'total': TaskService.count_tasks(**filters),
+            'next_cursor': page['next_cursor']
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -25,14 +210,32 @@ def get_tasks():
 
 
 @api_bp.route('/tasks/by-date', methods=['GET'])
+@conditional()
 def get_tasks_by_date():
     """
     Get tasks grouped by date
     Query params:
         - year: Filter by year (optional)
+        - export: 'json' or 'ndjson' streams the result incrementally (optional)
     """
     try:
         year = request.args.get('year', type=int)
+        export = get_export_format()
+
+        if export:
+            rows = TaskService.iter_tasks(
+                date_from=date(year, 1, 1) if year else None,
+                date_to=date(year, 12, 31) if year else None,
+                dated_only=True
+            )
+            if export == 'ndjson':
+                return ndjson_response(rows)
+            return json_grouped_response(
+                'data',
+                ((row['warning_date'], row) for row in rows),
+                'total_dates'
+            )
+
         tasks_by_date = TaskService.get_tasks_by_date(year)
 
         return jsonify({
@@ -40,6 +243,11 @@ def get_tasks_by_date():
             'data': tasks_by_date,
             'total_dates': len(tasks_by_date)
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -48,6 +256,7 @@ def get_tasks_by_date():
 
 
 @api_bp.route('/tasks/counts', methods=['GET'])
+@conditional()
 def get_task_counts():
     """
     Get count of tasks per date
@@ -69,16 +278,122 @@ def get_task_counts():
         }), 500
 
 
+@api_bp.route('/tasks/counts/departments', methods=['GET'])
+@conditional()
+def get_task_counts_by_department():
+    """
+    Get count of tasks per department
+    Query params:
+        - year: Filter by year (optional)
+    """
+    try:
+        year = request.args.get('year', type=int)
+        counts = TaskService.get_task_counts_by_department(year)
+
+        return jsonify({
+            'success': True,
+            'data': counts
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@api_bp.route('/tasks/counts/months', methods=['GET'])
+@conditional()
+def get_task_counts_by_month():
+    """
+    Get count of tasks per month (format: YYYY-MM)
+    Query params:
+        - year: Filter by year (optional)
+    """
+    try:
+        year = request.args.get('year', type=int)
+        counts = TaskService.get_task_counts_by_month(year)
+
+        return jsonify({
+            'success': True,
+            'data': counts
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@api_bp.route('/tasks/counts/dense', methods=['GET'])
+@conditional()
+def get_dense_task_counts():
+    """
+    Get task counts for a year as a dense day-indexed array
+    Query params:
+        - year: Year (optional, defaults to current year)
+        - departments: 1 to add one channel per department (optional)
+        - format: 'json' (default) or 'binary'
+
+    The binary format is a packed little-endian uint16 (or uint32 when a
+    count doesn't fit) buffer of channels x days values: channel 0 is
+    always the total, followed by one channel per department. Layout is
+    described by X-Start-Date, X-Days, X-Dtype and X-Departments (the
+    URL-encoded names of the department channels, empty without them)
+    headers; the total isn't named so it can't collide with a department
+    """
+    try:
+        year = request.args.get('year', type=int) or date.today().year
+        by_department = request.args.get('departments', type=int) == 1
+        output = request.args.get('format', 'json')
+
+        if output not in ('json', 'binary'):
+            raise ValueError("Invalid format, expected one of: json, binary")
+
+        dense = TaskService.get_dense_counts(year, by_department)
+
+        if output == 'json':
+            return jsonify(dict(dense, success=True))
+
+        channels = [dense['counts']] + dense['department_counts']
+        peak = max((max(channel) for channel in channels), default=0)
+        typecode, dtype = ('H', 'uint16') if peak <= 0xFFFF else ('I', 'uint32')
+
+        buffer = array(typecode)
+        for channel in channels:
+            buffer.extend(channel)
+        if sys.byteorder == 'big':
+            buffer.byteswap()
+
+        response = current_app.response_class(buffer.tobytes(), mimetype='application/octet-stream')
+        response.headers['X-Start-Date'] = dense['start_date']
+        response.headers['X-Days'] = str(dense['days'])
+        response.headers['X-Dtype'] = dtype
+        response.headers['X-Departments'] = ','.join(
+            quote(department, safe='') for department in dense['departments']
+        )
+        return response
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @api_bp.route('/tasks/upcoming', methods=['GET'])
+@conditional(daily=True)
 def get_upcoming_tasks():
     """
     Get upcoming tasks (from today onwards)
     Query params:
-        - limit: Number of tasks to return (optional)
+        - limit: Number of tasks to return (optional, capped at the max page size)
     """
     try:
-        limit = request.args.get('limit', type=int)
-        tasks = TaskService.get_upcoming_tasks(limit)
+        tasks = TaskService.get_upcoming_tasks(get_page_size())
 
         return jsonify({
             'success': True,
@@ -93,6 +408,7 @@ def get_upcoming_tasks():
 
 
 @api_bp.route('/tasks/date/<date_str>', methods=['GET'])
+@conditional()
 def get_tasks_for_date(date_str):
     """Get tasks for a specific date (format: YYYY-MM-DD)"""
     try:
@@ -112,6 +428,7 @@ def get_tasks_for_date(date_str):
 
 
 @api_bp.route('/departments', methods=['GET'])
+@conditional()
 def get_departments():
     """Get list of all departments"""
     try:
@@ -130,21 +447,102 @@ def get_departments():
 
 
 @api_bp.route('/stats', methods=['GET'])
+@conditional()
 def get_stats():
     """Get general statistics"""
     try:
-        date_range = TaskService.get_date_range()
-        departments = TaskService.get_departments()
-        all_tasks = TaskService.get_all_tasks()
+        stats = TaskService.get_stats()
+
+        return jsonify({
+            'success': True,
+            'stats': stats
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@api_bp.route('/search', methods=['GET'])
+@conditional()
+def search_tasks():
+    """
+    Full-text search over task content and department, best match first
+    Matching ignores case and Vietnamese diacritics ('duong day' finds 'Đường dây')
+    Query params:
+        - q: Search words, all must match (the last one as a prefix)
+        - limit: Page size (default SEARCH_PAGE_SIZE)
+        - offset: Offset of the page, use next_offset of the previous page
+        - department, date_from, date_to: Optional filters (YYYY-MM-DD)
+    total is the number of matching tasks over all pages
+    """
+    try:
+        terms = SearchService.parse_terms(request.args.get('q'))
+        limit = request.args.get('limit', type=int) or current_app.config['SEARCH_PAGE_SIZE']
+        limit = max(1, min(limit, current_app.config['SEARCH_MAX_PAGE_SIZE']))
+        offset = max(0, request.args.get('offset', 0, type=int))
+
+        filters = {
+            'department': request.args.get('department'),
+            'date_from': request.args.get('date_from'),
+            'date_to': request.args.get('date_to')
+        }
+        result = SearchService.search(terms, limit, offset, **filters)
 
         return jsonify({
             'success': True,
-            'stats': {
-                'total_tasks': len(all_tasks),
-                'total_departments': len(departments),
-                'date_range': date_range
-            }
+            'query': request.args.get('q'),
+            'tasks': result['tasks'],
+            'next_offset': result['next_offset'],
+            'total': SearchService.count(terms, **filters)
         })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@api_bp.route('/batch', methods=['GET', 'POST'])
+@conditional()
+def run_batch():
+    """
+    Evaluate several dashboard queries in one request
+    GET query params:
+        - q: Comma separated sub-queries 'type' or 'type:year',
+             e.g. q=counts:2026,tasks_by_date:2026,stats,departments
+    POST body:
+        { "queries": [{ "type": "counts", "year": 2026 }, { "type": "stats" }] }
+    Types: counts, counts_by_month, counts_by_department, tasks_by_date, departments, stats
+    """
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            queries = data.get('queries')
+        else:
+            queries = []
+            for item in request.args.get('q', '').split(','):
+                if item.strip():
+                    kind, _, year = item.strip().partition(':')
+                    queries.append({'type': kind, 'year': year or None})
+
+        results = BatchService.run(BatchService.parse_queries(queries))
+
+        return jsonify({
+            'success': True,
+            'results': results
+        })
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
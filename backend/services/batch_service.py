@@ -0,0 +1,185 @@
+"""
+Batched dashboard queries
+"""
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import func
+from models import Task, TaskDailyCount, db
+from services.cache import cached
+from services.task_service import TaskService, TASK_FIELDS
+from utils.serialization import iter_serialized
+
+# Sub-queries that take an optional year
+YEAR_QUERY_TYPES = ('counts', 'counts_by_month', 'counts_by_department', 'tasks_by_date')
+BATCH_QUERY_TYPES = YEAR_QUERY_TYPES + ('departments', 'stats')
+MAX_BATCH_QUERIES = 20
+
+
+class BatchService:
+    """Evaluate several dashboard queries together with shared scans"""
+
+    @staticmethod
+    def parse_queries(queries):
+        """
+        Validate sub-queries given as [{'type': ..., 'year': ...}, ...]
+        Returns tuple of (type, year) pairs
+        """
+        if not isinstance(queries, list) or not queries:
+            raise ValueError('queries must be a non-empty list')
+        if len(queries) > MAX_BATCH_QUERIES:
+            raise ValueError(f'At most {MAX_BATCH_QUERIES} queries per batch')
+
+        parsed = []
+        for index, query in enumerate(queries):
+            if not isinstance(query, dict) or query.get('type') not in BATCH_QUERY_TYPES:
+                raise ValueError(f"Query {index}: type must be one of: {', '.join(BATCH_QUERY_TYPES)}")
+
+            year = query.get('year')
+            if year is not None:
+                if query['type'] not in YEAR_QUERY_TYPES:
+                    raise ValueError(f"Query {index}: type '{query['type']}' doesn't take a year")
+                try:
+                    if isinstance(year, (bool, float)):
+                        raise TypeError(year)
+                    year = int(year)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Query {index}: year must be an integer") from None
+
+            parsed.append((query['type'], year))
+
+        return tuple(parsed)
+
+    @staticmethod
+    @cached
+    def run(queries):
+        """
+        Evaluate parsed sub-queries in one session
+        All count queries share one scan of the task_daily_counts rollup,
+        all tasks_by_date queries share one scan of tasks, and stats and
+        departments share one per-department aggregate
+        Returns list of { 'type', 'year', 'data' } in query order
+        """
+        count_years = {year for kind, year in queries if kind in YEAR_QUERY_TYPES[:3]}
+        task_years = {year for kind, year in queries if kind == 'tasks_by_date'}
+        kinds = {kind for kind, year in queries}
+
+        rollup_rows = BatchService._scan_rollup(count_years) if count_years else []
+        task_rows = BatchService._scan_tasks(task_years) if task_years else []
+        summary = BatchService._scan_departments() if kinds & {'stats', 'departments'} else None
+
+        results = []
+        for kind, year in queries:
+            if kind == 'tasks_by_date':
+                data = BatchService._group_tasks_by_date(task_rows, year)
+            elif kind in YEAR_QUERY_TYPES:
+                data = BatchService._count_rollup(rollup_rows, kind, year)
+            elif kind == 'departments':
+                # Same order as TaskService.get_departments (/api/departments)
+                data = sorted(summary)
+            else:
+                data = BatchService._stats_from_summary(summary)
+
+            results.append({'type': kind, 'year': year, 'data': data})
+
+        return results
+
+    @staticmethod
+    def _in_year(warning_date, year):
+        """Check if date falls into year (any year when year is None)"""
+        return year is None or warning_date.year == year
+
+    @staticmethod
+    def _year_bounds(years):
+        """Date bounds covering all years, None when any year is unbounded"""
+        if None in years:
+            return None, None
+        return date(min(years), 1, 1), date(max(years), 12, 31)
+
+    @staticmethod
+    def _scan_rollup(years):
+        """Read rollup rows covering all requested years"""
+        date_from, date_to = BatchService._year_bounds(years)
+        query = db.session.query(
+            TaskDailyCount.warning_date,
+            TaskDailyCount.department,
+            TaskDailyCount.count
+        )
+        if date_from:
+            query = query.filter(
+                TaskDailyCount.warning_date >= date_from,
+                TaskDailyCount.warning_date <= date_to
+            )
+        return query.all()
+
+    @staticmethod
+    def _count_rollup(rows, kind, year):
+        """Aggregate shared rollup rows like the matching TaskService count query"""
+        counts = defaultdict(int)
+
+        for warning_date, department, count in rows:
+            if not BatchService._in_year(warning_date, year):
+                continue
+            if kind == 'counts':
+                counts[warning_date.isoformat()] += count
+            elif kind == 'counts_by_month':
+                counts[f"{warning_date.year:04d}-{warning_date.month:02d}"] += count
+            else:
+                counts[department] += count
+
+        # All-time department totals also include undated tasks
+        if kind == 'counts_by_department' and year is None:
+            undated = db.session.query(Task.department, func.count(Task.id)).filter(
+                Task.warning_date.is_(None)
+            ).group_by(Task.department)
+            for department, count in undated.all():
+                counts[department] += count
+
+        return dict(counts)
+
+    @staticmethod
+    def _scan_tasks(years):
+        """Read dated task rows covering all requested years"""
+        date_from, date_to = BatchService._year_bounds(years)
+        query = TaskService._task_columns_query(TASK_FIELDS, date_from=date_from, date_to=date_to)
+        return query.filter(Task.warning_date.isnot(None)).order_by(
+            Task.warning_date.asc(),
+            Task.id.asc()
+        ).all()
+
+    @staticmethod
+    def _group_tasks_by_date(rows, year):
+        """Group shared task rows by date like TaskService.get_tasks_by_date"""
+        tasks_by_date = defaultdict(list)
+        rows = (row for row in rows if BatchService._in_year(row.warning_date, year))
+
+        for task in iter_serialized(rows, TASK_FIELDS):
+            tasks_by_date[task['warning_date']].append(task)
+
+        return dict(tasks_by_date)
+
+    @staticmethod
+    def _scan_departments():
+        """Per-department task count and date range in one aggregate query"""
+        rows = db.session.query(
+            Task.department,
+            func.count(Task.id),
+            func.min(Task.warning_date),
+            func.max(Task.warning_date)
+        ).group_by(Task.department).all()
+
+        return {department: (count, min_date, max_date) for department, count, min_date, max_date in rows}
+
+    @staticmethod
+    def _stats_from_summary(summary):
+        """Build the /api/stats payload from the per-department summary"""
+        min_dates = [min_date for count, min_date, max_date in summary.values() if min_date]
+        max_dates = [max_date for count, min_date, max_date in summary.values() if max_date]
+
+        return {
+            'total_tasks': sum(count for count, min_date, max_date in summary.values()),
+            'total_departments': len(summary),
+            'date_range': {
+                'min_date': min(min_dates).isoformat() if min_dates else None,
+                'max_date': max(max_dates).isoformat() if max_dates else None
+            }
+        }
@@ -0,0 +1,331 @@
+"""
+Result cache for task read queries
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class SQLiteCacheBackend:
+    """
+    Cache store shared by all worker processes on the host
+    Uses a small SQLite side database holding the dataset version stamp
+    and the cached results, so an import in one gunicorn worker
+    invalidates the entries of every other worker
+    """
+
+    def __init__(self, path, max_entries=1024):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._ensure_schema()
+
+    def _connect(self):
+        """Get connection for current thread (reopened after fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _ensure_schema(self):
+        """Create cache tables if they don't exist"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_meta ('
+            'name TEXT PRIMARY KEY, value INTEGER NOT NULL)'
+        )
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_entries ('
+            'key TEXT PRIMARY KEY, version INTEGER NOT NULL, '
+            'value TEXT NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('version', 0)"
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('changed_at', ?)",
+            (int(time.time()),)
+        )
+
+    def get_version(self):
+        """Get shared dataset version"""
+        row = self._connect().execute(
+            "SELECT value FROM cache_meta WHERE name = 'version'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_version_info(self):
+        """Get shared dataset version and the time it was set, returns (version, changed_at)"""
+        meta = dict(self._connect().execute(
+            "SELECT name, value FROM cache_meta WHERE name IN ('version', 'changed_at')"
+        ).fetchall())
+        return meta.get('version', 0), meta.get('changed_at', 0)
+
+    def bump_version(self):
+        """Atomically increment shared dataset version and drop stale entries"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("UPDATE cache_meta SET value = value + 1 WHERE name = 'version'")
+            conn.execute(
+                "UPDATE cache_meta SET value = ? WHERE name = 'changed_at'",
+                (int(time.time()),)
+            )
+            version = conn.execute(
+                "SELECT value FROM cache_meta WHERE name = 'version'"
+            ).fetchone()[0]
+            conn.execute('DELETE FROM cache_entries WHERE version < ?', (version,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return version
+
+    def get(self, key, version):
+        """Get cached value for key at version, returns (found, value)"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT value FROM cache_entries WHERE key = ? AND version = ?',
+            (key, version)
+        ).fetchone()
+        if row is None:
+            return False, None
+
+        conn.execute(
+            'UPDATE cache_entries SET accessed_at = ? WHERE key = ?',
+            (time.time(), key)
+        )
+        return True, json.loads(row[0])
+
+    def set(self, key, version, value):
+        """Store value for key at version, evicting least recently used entries"""
+        conn = self._connect()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, version, value, accessed_at) '
+            'VALUES (?, ?, ?, ?)',
+            (key, version, json.dumps(value), time.time())
+        )
+        evicted = conn.execute(
+            'DELETE FROM cache_entries WHERE key IN ('
+            'SELECT key FROM cache_entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        ).rowcount
+        return max(evicted, 0)
+
+    def clear(self):
+        """Remove all cached entries (the version stamp is kept)"""
+        self._connect().execute('DELETE FROM cache_entries')
+
+    def count(self):
+        """Get number of shared entries"""
+        return self._connect().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+
+
+class ResultCache:
+    """
+    Bounded LRU cache for TaskService results
+    Every entry is tied to the dataset version it was computed for,
+    bumping the version (after an import) drops all cached results.
+    With a shared backend the local LRU acts as a first level in front
+    of the cross-process store and the version stamp lives in the backend
+    """
+
+    def __init__(self, max_entries=256, enabled=True, backend=None):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.backend = backend
+        self.version = 0
+        self.changed_at = int(time.time())
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._entries_version = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure cache from application config"""
+        self.max_entries = app.config.get('CACHE_MAX_ENTRIES', self.max_entries)
+        self.enabled = app.config.get('CACHE_ENABLED', self.enabled)
+
+        if app.config.get('CACHE_BACKEND') == 'sqlite':
+            self.backend = SQLiteCacheBackend(
+                app.config['CACHE_PATH'],
+                max_entries=app.config.get('CACHE_SHARED_MAX_ENTRIES', 1024)
+            )
+        else:
+            self.backend = None
+
+        with self._lock:
+            self._entries.clear()
+            self.version = self.get_version()
+            self._entries_version = self.version
+
+    def get_version(self):
+        """Get current dataset version"""
+        if self.backend is not None:
+            return self.backend.get_version()
+        return self.version
+
+    def get_version_info(self):
+        """
+        Get current dataset version and the time it was set (epoch seconds)
+        Returns tuple: (version, changed_at)
+        """
+        if self.backend is not None:
+            return self.backend.get_version_info()
+        return self.version, self.changed_at
+
+    def bump_version(self):
+        """Mark the dataset as changed, invalidating all cached results"""
+        if self.backend is not None:
+            version = self.backend.bump_version()
+        else:
+            with self._lock:
+                version = self.version + 1
+
+        with self._lock:
+            self.version = version
+            self.changed_at = int(time.time())
+            self._sync_version()
+        return version
+
+    def get_or_compute(self, key, compute):
+        """Return cached value for key, computing and storing it on a miss"""
+        if not self.enabled:
+            return compute()
+
+        version = self.get_version()
+
+        with self._lock:
+            self.version = max(self.version, version)
+            self._sync_version()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        shared_key = repr(key)
+        found = False
+        if self.backend is not None:
+            found, value = self.backend.get(shared_key, version)
+
+        if found:
+            with self._lock:
+                self.shared_hits += 1
+        else:
+            with self._lock:
+                self.misses += 1
+            value = compute()
+            if self.backend is not None:
+                evicted = self.backend.set(shared_key, version, value)
+                with self._lock:
+                    self.evictions += evicted
+
+        with self._lock:
+            # Don't store results computed against an outdated dataset
+            if version == self.version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return value
+
+    def get_local(self, key):
+        """
+        Look up key in this process only, returns (found, value)
+        For values that can't be shared as JSON (e.g. compressed bodies)
+        """
+        if not self.enabled:
+            return False, None
+
+        version = self.get_version()
+
+        with self._lock:
+            self.version = max(self.version, version)
+            self._sync_version()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put_local(self, key, value):
+        """Store value in this process only"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._sync_version()
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _sync_version(self):
+        """Drop entries computed for an older dataset version (lock must be held)"""
+        if self._entries_version != self.version:
+            self._entries.clear()
+            self._entries_version = self.version
+
+    def clear(self):
+        """Remove all entries and reset counters"""
+        if self.backend is not None:
+            self.backend.clear()
+
+        with self._lock:
+            self._entries.clear()
+            self._entries_version = self.version
+            self.hits = 0
+            self.shared_hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def get_stats(self):
+        """Get cache statistics for this worker"""
+        shared_entries = self.backend.count() if self.backend is not None else None
+
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'backend': 'sqlite' if self.backend is not None else 'memory',
+                'version': self.version,
+                'entries': len(self._entries),
+                'shared_entries': shared_entries,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0
+            }
+
+
+result_cache = ResultCache()
+
+
+def cached(func):
+    """Decorator caching a TaskService query by function name and arguments"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        return result_cache.get_or_compute(key, lambda: func(*args, **kwargs))
+    return wrapper
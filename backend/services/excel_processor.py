@@ -1,154 +1,453 @@
 """
 Excel file processing service
 """
+import multiprocessing
+import os
+import shutil
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
 import openpyxl
-from datetime import datetime
-from models import Task, db
+from flask import current_app
+from sqlalchemy import bindparam, or_
+from werkzeug.utils import secure_filename
+from models import Task, TaskDailyCount, db, dialect_insert
+from services.cache import result_cache
+from services.parse_cache import parse_cache
+from services.sheet_parser import (
+    FIRST_DATA_ROW, TASK_COLUMNS, error_record, iter_sheet_tasks, list_sheets, new_parse_stats, parse_sheet
+)
 
 
 class ExcelProcessor:
     """Process Excel files for task import"""
 
-    def __init__(self):
+    def __init__(self, batch_size=None, on_batch=None):
         self.errors = []
+        self.batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+        # Optional callback receiving stats after each inserted batch
+        self.on_batch = on_batch
         self.stats = {
             'total_rows': 0,
             'valid_rows': 0,
             'invalid_rows': 0,
             'new_records': 0,
-            'duplicates_skipped': 0
+            'duplicates_skipped': 0,
+            'duration_seconds': 0.0,
+            'rows_per_second': 0.0
         }
 
     def parse_excel(self, file_path):
         """
-        Parse Excel file and extract tasks
+        Parse Excel file (a path or a binary file object) and extract tasks
         Returns list of task dictionaries
         """
-        tasks = []
+        return list(self.iter_tasks(file_path))
+
+    def iter_tasks(self, file_path):
+        """
+        Stream tasks from Excel file (a path or a binary file object)
+        The workbook is opened in read-only mode and rows are yielded one
+        at a time as validated task dictionaries, so memory stays flat
+        regardless of workbook size
+        """
         self.errors = []
 
         try:
-            wb = openpyxl.load_workbook(file_path)
-            ws = wb.active
+            wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        except Exception as e:
+            self.errors.append(error_record('unreadable_file', f"Error reading Excel file: {str(e)}"))
+            raise
 
-            # Get total rows
-            self.stats['total_rows'] = ws.max_row - 2  # Exclude header rows
+        try:
+            rows = wb.active.iter_rows(min_row=FIRST_DATA_ROW, max_col=len(TASK_COLUMNS), values_only=True)
+            yield from iter_sheet_tasks(rows, self.stats, self.errors)
+        finally:
+            wb.close()
 
-            # Read data starting from row 3 (assuming row 1-2 are headers)
-            current_stt = None
-            current_department = None
+    def iter_cached_tasks(self, file_path, digest):
+        """
+        Stream tasks like iter_tasks, through the parse cache
+        When the workbook with this SHA-256 digest was parsed before (e.g.
+        by a preview) its cached tasks are replayed without opening it,
+        otherwise it is parsed and the tasks are written to the cache as
+        they stream by. stats['parse_cache'] is 'hit' or 'miss'
+        """
+        if parse_cache.contains(digest):
+            self.errors = []
+            self.stats['parse_cache'] = 'hit'
+            yield from parse_cache.read(digest, self.stats, self.errors)
+            return
 
-            for row_idx, row in enumerate(ws.iter_rows(min_row=3, values_only=True), start=3):
-                if not any(row):  # Skip completely empty rows
-                    continue
+        self.stats['parse_cache'] = 'miss'
+        parse_stats = {key: self.stats[key] for key in new_parse_stats()}
+        writer = parse_cache.writer(digest)
 
-                try:
-                    stt = row[0] if row[0] else current_stt
-                    department = row[1] if row[1] else current_department
-                    content = row[2]
-                    warning_date = row[3]
-
-                    # Update current values for merged cells
-                    if row[0]:
-                        current_stt = row[0]
-                    if row[1]:
-                        current_department = row[1]
-
-                    # Validate required fields
-                    if not content:
-                        self.errors.append(f"Row {row_idx}: Missing content")
-                        self.stats['invalid_rows'] += 1
-                        continue
-
-                    if not department:
-                        self.errors.append(f"Row {row_idx}: Missing department")
-                        self.stats['invalid_rows'] += 1
-                        continue
-
-                    # Parse date
-                    parsed_date = None
-                    if warning_date:
-                        if isinstance(warning_date, datetime):
-                            parsed_date = warning_date.date()
-                        elif isinstance(warning_date, str):
-                            try:
-                                parsed_date = datetime.strptime(warning_date, '%Y-%m-%d').date()
-                            except ValueError:
-                                self.errors.append(f"Row {row_idx}: Invalid date format")
-
-                    # Create task dictionary
-                    task_dict = {
-                        'stt': int(stt) if stt and str(stt).isdigit() else None,
-                        'department': str(department).strip(),
-                        'content': str(content).strip(),
-                        'warning_date': parsed_date
-                    }
-
-                    tasks.append(task_dict)
-                    self.stats['valid_rows'] += 1
-
-                except Exception as e:
-                    self.errors.append(f"Row {row_idx}: {str(e)}")
-                    self.stats['invalid_rows'] += 1
+        try:
+            for task in self.iter_tasks(file_path):
+                if writer:
+                    writer.add(task)
+                yield task
+        except BaseException:
+            if writer:
+                writer.discard()
+            raise
+
+        if writer:
+            writer.commit(
+                {key: self.stats[key] - value for key, value in parse_stats.items()},
+                self.errors
+            )
+
+    @staticmethod
+    def collect_workbooks(directory, errors=None):
+        """
+        List the workbooks of a multi-file upload directory
+        Zip archives are extracted next to them (only .xlsx members, bounded
+        by IMPORT_MAX_FILES and IMPORT_MAX_UNCOMPRESSED_SIZE). Other files
+        (e.g. legacy .xls workbooks) are skipped and reported in errors
+        Returns sorted list of workbook paths
+        """
+        max_files = current_app.config.get('IMPORT_MAX_FILES', 50)
+        max_size = current_app.config.get('IMPORT_MAX_UNCOMPRESSED_SIZE', 200 * 1024 * 1024)
+        errors = errors if errors is not None else []
+        paths = []
+
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if name.lower().endswith('.zip'):
+                paths.extend(ExcelProcessor._extract_archive(path, directory, max_size, errors))
+            elif name.lower().endswith('.xlsx'):
+                paths.append(path)
+            else:
+                errors.append(ExcelProcessor._skipped_file(name))
+
+        if not paths:
+            raise ValueError('No .xlsx workbooks found in upload')
+        if len(paths) > max_files:
+            raise ValueError(f'Too many workbooks ({len(paths)}), at most {max_files} per import')
+
+        return sorted(paths)
+
+    @staticmethod
+    def _skipped_file(name):
+        return error_record(
+            'skipped_file', f"{name}: Skipped, only .xlsx workbooks (or zip archives of them) can be imported", name
+        )
+
+    @staticmethod
+    def _extract_archive(archive_path, directory, max_size, errors):
+        """Extract .xlsx members of a zip archive, returns their paths (other members are reported in errors)"""
+        paths = []
+        archive_label = os.path.basename(archive_path)
+
+        with zipfile.ZipFile(archive_path) as archive:
+            members = []
+            for info in archive.infolist():
+                # Folders and OS/Office metadata files aren't worth reporting
+                if (info.is_dir() or info.filename.startswith('__MACOSX/')
+                        or os.path.basename(info.filename).startswith(('.', '~$'))):
                     continue
+                if info.filename.lower().endswith('.xlsx'):
+                    members.append(info)
+                else:
+                    errors.append(ExcelProcessor._skipped_file(f'{archive_label}/{info.filename}'))
+            if sum(info.file_size for info in members) > max_size:
+                raise ValueError(f'{archive_label}: archive is too large when extracted')
 
-            wb.close()
+            archive_name = os.path.splitext(os.path.basename(archive_path))[0]
+            for index, info in enumerate(members):
+                # Never trust member paths, write to our own flat names
+                name = secure_filename(os.path.basename(info.filename)) or f'sheet_{index}.xlsx'
+                path = os.path.join(directory, f'{archive_name}_{index}_{name}')
+                with archive.open(info) as source, open(path, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                paths.append(path)
 
-        except Exception as e:
-            self.errors.append(f"Error reading Excel file: {str(e)}")
-            raise
+        return paths
+
+    def iter_workbooks(self, file_paths, all_sheets=True, workers=None):
+        """
+        Stream tasks from several workbooks, parsing sheets in parallel
+        Each (workbook, sheet) is parsed by a ProcessPoolExecutor worker into
+        a batch of normalized tasks; batches are yielded here as they finish,
+        so a single writer (merge_tasks) dedup-merges them while the other
+        sheets are still being parsed. Errors are prefixed with file/sheet
+        and added to self.errors (after those of collect_workbooks).
+        A sheet with more than IMPORT_MAX_SHEET_ROWS valid rows is rejected,
+        as its rows are sent back from the worker in one piece
+        """
+        max_rows = current_app.config.get('IMPORT_MAX_SHEET_ROWS')
+        units = []
+        for path in file_paths:
+            name = os.path.basename(path)
+            try:
+                sheets = list_sheets(path) if all_sheets else [None]
+            except Exception as e:
+                self.errors.append(error_record('unreadable_file', f"{name}: Error reading Excel file: {str(e)}", name))
+                continue
+            units.extend((path, sheet, f"{name}/{sheet}" if sheet else name, max_rows) for sheet in sheets)
+
+        self.stats['sheets'] = len(units)
+        workers = min(workers or current_app.config.get('IMPORT_PARSE_WORKERS') or os.cpu_count() or 1, len(units))
 
-        return tasks
+        if workers <= 1:
+            results = (parse_sheet(*unit) for unit in units)
+            yield from self._merge_parsed(results)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ExcelProcessor._parse_context()) as pool:
+            futures = [pool.submit(parse_sheet, *unit) for unit in units]
+            yield from self._merge_parsed(future.result() for future in as_completed(futures))
+
+    @staticmethod
+    def _parse_context():
+        """
+        Multiprocessing context for parse workers
+        Import jobs run in threads and forking a threaded process isn't safe,
+        so workers are forked from a clean fork server process that has the
+        parser preloaded
+        """
+        method = current_app.config.get('IMPORT_PARSE_START_METHOD', 'forkserver')
+        if method not in multiprocessing.get_all_start_methods():
+            method = 'spawn'
+        context = multiprocessing.get_context(method)
+        if method == 'forkserver':
+            context.set_forkserver_preload(['services.sheet_parser'])
+        return context
+
+    def _merge_parsed(self, results):
+        """Fold parse_sheet results into stats/errors and yield their tasks as dictionaries"""
+        for result in results:
+            for key, value in result['stats'].items():
+                self.stats[key] += value
+            self.errors.extend(result['errors'])
+            for row in result['rows']:
+                yield dict(zip(TASK_COLUMNS, row))
 
     def merge_tasks(self, new_tasks):
         """
         Merge new tasks with existing tasks in database
+        Accepts a list or an iterator (e.g. iter_tasks) of task dictionaries
         Skip duplicates based on: department + content + warning_date
+        (compared through the unique Task.content_hash)
+        Batches are inserted in one transaction, committed at the end
         Returns statistics about the merge operation
         """
-        # Get all existing tasks
-        existing_tasks = Task.query.all()
-
-        # Create set of unique keys for existing tasks
-        existing_keys = set()
-        for task in existing_tasks:
-            key = self._create_task_key(task.department, task.content, task.warning_date)
-            existing_keys.add(key)
-
-        # Filter out duplicates from new tasks
-        tasks_to_add = []
-        for new_task in new_tasks:
-            key = self._create_task_key(
-                new_task['department'],
-                new_task['content'],
-                new_task['warning_date']
-            )
+        started = time.perf_counter()
+        statement = self._insert_ignore_duplicates()
+        processed = 0
+        inserted = 0
 
-            if key in existing_keys:
+        # Consume tasks (a list or a streaming iterator) in chunks of batch_size
+        tasks = iter(new_tasks)
+        while True:
+            batch = list(islice(tasks, self.batch_size))
+            if not batch:
+                break
+            batch_inserted = self._insert_batch(statement, batch)
+            processed += len(batch)
+            inserted += batch_inserted
+
+            # Duplicates (against the table and within the file) are skipped
+            # by the unique content_hash index
+            self.stats['new_records'] += batch_inserted
+            self.stats['duplicates_skipped'] += len(batch) - batch_inserted
+
+            if self.on_batch:
+                self.on_batch(self.stats)
+
+        db.session.commit()
+
+        elapsed = time.perf_counter() - started
+        self.stats['duration_seconds'] = round(elapsed, 4)
+        self.stats['rows_per_second'] = round(processed / elapsed, 1) if elapsed > 0 else 0.0
+
+        # Invalidate cached read results for the previous dataset
+        if inserted:
+            result_cache.bump_version()
+
+        return self.stats
+
+    def delta_tasks(self, new_tasks):
+        """
+        Make the database match the workbook within the workbook's scope
+        The scope is every existing task of the workbook's departments in
+        its date range (undated tasks only when the workbook has undated
+        rows). Rows are matched by content hash first (unchanged, or only
+        their STT updated), then by (stt, department, warning_date): a
+        matched pair with other content is an update, leftover workbook
+        rows are inserted and leftover existing rows removed.
+        Only those writes are made, in one transaction, so re-importing a
+        master file costs as much as what changed in it. When rows of the
+        workbook failed validation nothing is removed: their stored tasks
+        would look deleted from it (removals_skipped counts what was kept)
+        Returns statistics about the delta
+        """
+        started = time.perf_counter()
+        table = Task.__table__
+        for key in ('updated_records', 'unchanged_records', 'removed_records', 'removals_skipped'):
+            self.stats[key] = 0
+
+        # The content hash is unique, keep the first of identical rows
+        incoming = {}
+        processed = 0
+        for task in new_tasks:
+            processed += 1
+            content_hash = Task.make_content_hash(task['department'], task['content'], task['warning_date'])
+            if content_hash in incoming:
                 self.stats['duplicates_skipped'] += 1
             else:
-                tasks_to_add.append(new_task)
-                existing_keys.add(key)  # Add to set to avoid duplicates within new tasks
+                incoming[content_hash] = task
+
+        if self.on_batch:
+            self.on_batch(self.stats)
+
+        # Existing rows whose content is still in the workbook are kept
+        leftovers = defaultdict(list)
+        stt_updates = []
+        unchanged = 0
+        for row in self._load_scope(incoming.values()):
+            task = incoming.pop(row.content_hash, None)
+            if task is None:
+                leftovers[(row.stt, row.department, row.warning_date)].append(row)
+            elif task['stt'] != row.stt:
+                stt_updates.append({'task_id': row.id, 'stt': task['stt']})
+            else:
+                unchanged += 1
+
+        # Pair the remaining rows by position: edited content is an update
+        inserts = []
+        updates = []
+        for content_hash, task in incoming.items():
+            candidates = leftovers.get((task['stt'], task['department'], task['warning_date']))
+            if candidates:
+                row = candidates.pop(0)
+                updates.append({
+                    'task_id': row.id,
+                    'content': task['content'],
+                    'content_hash': content_hash,
+                    'search_text': Task.make_search_text(task['department'], task['content'])
+                })
+            else:
+                inserts.append(task)
+        removed = [row for rows in leftovers.values() for row in rows]
+
+        # An invalid row never reaches incoming, removing its stored task
+        # would turn a typo in the workbook into data loss
+        if removed and self.stats['invalid_rows']:
+            self.stats['removals_skipped'] = len(removed)
+            self.errors.append(error_record(
+                'removals_skipped',
+                f"{len(removed)} stored task(s) not removed: "
+                f"{self.stats['invalid_rows']} workbook row(s) failed validation"
+            ))
+            removed = []
 
-        # Add new tasks to database
-        for task_dict in tasks_to_add:
-            task = Task(**task_dict)
-            db.session.add(task)
-            self.stats['new_records'] += 1
+        # Removed and updated rows never hold an incoming hash, so the
+        # writes can't collide on the unique content_hash index
+        removed_ids = [row.id for row in removed]
+        for start in range(0, len(removed_ids), self.batch_size):
+            db.session.execute(table.delete().where(table.c.id.in_(removed_ids[start:start + self.batch_size])))
+        TaskDailyCount.apply(((row.warning_date, row.department) for row in removed), sign=-1)
+
+        if updates:
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('task_id')).values(
+                    content=bindparam('content'),
+                    content_hash=bindparam('content_hash'),
+                    search_text=bindparam('search_text')
+                ),
+                updates
+            )
+        if stt_updates:
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('task_id')).values(stt=bindparam('stt')),
+                stt_updates
+            )
+
+        inserted = 0
+        statement = self._insert_ignore_duplicates()
+        for start in range(0, len(inserts), self.batch_size):
+            inserted += self._insert_batch(statement, inserts[start:start + self.batch_size])
 
         db.session.commit()
 
+        self.stats['new_records'] += inserted
+        self.stats['updated_records'] = len(updates) + len(stt_updates)
+        self.stats['unchanged_records'] = unchanged
+        self.stats['removed_records'] = len(removed)
+
+        elapsed = time.perf_counter() - started
+        self.stats['duration_seconds'] = round(elapsed, 4)
+        self.stats['rows_per_second'] = round(processed / elapsed, 1) if elapsed > 0 else 0.0
+
+        if inserted or updates or stt_updates or removed:
+            result_cache.bump_version()
+
         return self.stats
 
-    def _create_task_key(self, department, content, warning_date):
-        """Create unique key for task deduplication"""
-        date_str = warning_date.isoformat() if warning_date else 'no_date'
-        return f"{department}|{content}|{date_str}"
+    @staticmethod
+    def _load_scope(tasks):
+        """Get (id, stt, department, warning_date, content_hash) of existing tasks in the scope of tasks"""
+        departments = {task['department'] for task in tasks}
+        if not departments:
+            return []
+
+        dates = [task['warning_date'] for task in tasks if task['warning_date']]
+        in_scope = []
+        if dates:
+            in_scope.append(Task.warning_date.between(min(dates), max(dates)))
+        if len(dates) < len(tasks):
+            in_scope.append(Task.warning_date.is_(None))
+
+        return db.session.query(
+            Task.id, Task.stt, Task.department, Task.warning_date, Task.content_hash
+        ).filter(Task.department.in_(departments), or_(*in_scope)).order_by(Task.id).all()
+
+    def _insert_batch(self, statement, batch):
+        """
+        Insert a batch of task dictionaries with one executemany statement
+        Rows are written without building ORM objects, rows whose
+        content_hash already exists are ignored by the database
+        (the search index is updated by the database as well)
+        Returns number of inserted rows
+        """
+        rows = [
+            dict(
+                task,
+                content_hash=Task.make_content_hash(
+                    task['department'],
+                    task['content'],
+                    task['warning_date']
+                ),
+                search_text=Task.make_search_text(task['department'], task['content'])
+            )
+            for task in batch
+        ]
+        inserted = db.session.execute(statement, rows).all()
+
+        # Keep the daily rollup in step, in the same transaction
+        TaskDailyCount.apply(inserted)
+
+        return len(inserted)
+
+    def _insert_ignore_duplicates(self):
+        """
+        Build INSERT ... ON CONFLICT (content_hash) DO NOTHING for the current database
+        Returns (warning_date, department) of the rows actually inserted
+        """
+        table = Task.__table__
+        return dialect_insert(table).on_conflict_do_nothing(
+            index_elements=['content_hash']
+        ).returning(table.c.warning_date, table.c.department)
 
     def get_stats(self):
         """Get import statistics"""
         return self.stats
 
     def get_errors(self):
-        """Get list of errors encountered during processing"""
+        """Get list of error records (see error_record) encountered during processing"""
         return self.errors
@@ -0,0 +1,272 @@
+"""
+Background import job service
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, or_
+from models import ImportJob, db
+from services.excel_processor import ExcelProcessor
+from services.job_progress import job_progress
+from services.sheet_parser import new_parse_stats
+from services.task_service import TaskService
+from utils.helpers import cleanup_file
+from utils.metrics import record_import
+
+# Keep at most this many row errors on a job
+MAX_JOB_ERRORS = 500
+
+# merge: add new rows, skipping duplicates (ExcelProcessor.merge_tasks)
+# delta: make the workbook's scope match it (ExcelProcessor.delta_tasks)
+IMPORT_MODES = ('merge', 'delta')
+
+# Jobs run in the worker process that queued them and die with it
+STALE_JOB_ERROR = 'Import interrupted: the job did not finish in time (the server was restarted or the worker died)'
+# In-memory uploads (empty file_path) are lost with the worker as well
+LOST_UPLOAD_ERROR = STALE_JOB_ERROR + '. The upload was held in memory and cannot be recovered, upload the file again'
+
+
+class ImportJobService:
+    """Queue and run Excel imports outside of the request"""
+
+    _executor = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def create_job(file_path, filename, user_id=None, file_digest=None, mode='merge'):
+        """
+        Create a queued job for an upload (file_path is empty for in-memory uploads)
+        Jobs aren't resumed after a restart: an in-memory upload is gone with
+        its worker and the job is failed as stale (see fail_stale_jobs)
+        file_digest is the SHA-256 of a single-workbook upload, used by the
+        parse cache and to skip unchanged re-uploads. mode is one of
+        IMPORT_MODES
+        """
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Invalid import mode '{mode}', expected one of: {', '.join(IMPORT_MODES)}")
+
+        job = ImportJob(
+            file_path=file_path,
+            filename=filename,
+            created_by=user_id,
+            file_digest=file_digest,
+            mode=mode
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    @staticmethod
+    def submit(job, upload=None):
+        """
+        Run job in the background thread pool
+        upload is the spooled workbook of an in-memory upload (see
+        spool_upload), the job takes ownership and closes it.
+        When IMPORT_ASYNC is disabled the job runs inline before returning
+        """
+        app = current_app._get_current_object()
+
+        if not app.config.get('IMPORT_ASYNC', True):
+            ImportJobService.run(job.id, upload)
+            return
+
+        ImportJobService._get_executor(app).submit(ImportJobService._run_in_context, app, job.id, upload)
+
+    @staticmethod
+    def _get_executor(app):
+        """Get the per-process worker pool, creating it on first use"""
+        with ImportJobService._lock:
+            if ImportJobService._executor is None:
+                ImportJobService._executor = ThreadPoolExecutor(
+                    max_workers=app.config.get('IMPORT_WORKERS', 1),
+                    thread_name_prefix='import-job'
+                )
+            return ImportJobService._executor
+
+    @staticmethod
+    def _run_in_context(app, job_id, upload=None):
+        """Run job inside an application context (worker thread entry point)"""
+        with app.app_context():
+            try:
+                ImportJobService.run(job_id, upload)
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def run(job_id, upload=None):
+        """
+        Parse and merge the job's workbook(s) in a single transaction
+        Progress is published to job_progress after each batch (nothing is
+        committed until the import succeeds), a failed import is rolled
+        back entirely and can simply be re-run.
+        A workbook already parsed (e.g. by a preview) is read from the parse
+        cache, one already imported into the current tasks table is skipped
+        """
+        job = db.session.get(ImportJob, job_id)
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        def publish(stats):
+            job_progress.publish(job.id, ImportJob.progress_from_stats(stats))
+
+        processor = ExcelProcessor(on_batch=publish)
+
+        try:
+            previous = ImportJobService.find_unchanged_import(job.file_digest, job.mode)
+
+            if previous is not None:
+                stats = ImportJobService._replay_unchanged(processor, previous, job.mode)
+            else:
+                # Multi-file uploads are saved as a directory, parse every sheet
+                if os.path.isdir(job.file_path):
+                    workbooks = ExcelProcessor.collect_workbooks(job.file_path, processor.errors)
+                    tasks = processor.iter_workbooks(workbooks, all_sheets=True)
+                else:
+                    source = upload if upload is not None else job.file_path
+                    tasks = processor.iter_cached_tasks(source, job.file_digest)
+
+                if job.mode == 'delta':
+                    stats = processor.delta_tasks(tasks)
+                else:
+                    stats = processor.merge_tasks(tasks)
+
+            job.update_progress(stats)
+            job.stats = json.dumps(stats)
+            if stats['valid_rows']:
+                job.status = 'completed'
+                job.dataset_stamp = ImportJobService.get_dataset_stamp()
+            else:
+                job.status = 'failed'
+                job.error = 'No valid tasks found in Excel file'
+
+        except Exception as e:
+            # Nothing of the import was committed
+            db.session.rollback()
+            processor.stats['new_records'] = 0
+
+            job.update_progress(processor.stats)
+            job.status = 'failed'
+            job.error = f'Import failed: {str(e)}'
+
+        finally:
+            job_progress.discard(job.id)
+            if upload is not None:
+                upload.close()
+            else:
+                cleanup_file(job.file_path)
+
+        job.errors = json.dumps(processor.get_errors()[:MAX_JOB_ERRORS])
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+        record_import(processor.stats, (job.finished_at - job.started_at).total_seconds(), job.status)
+
+    @staticmethod
+    def get_dataset_stamp():
+        """Compact stamp of the tasks table, changes with every insert or delete"""
+        stamp = TaskService.get_dataset_stamp()
+        return f"{stamp['total_tasks']}:{stamp['last_modified']}"
+
+    @staticmethod
+    def find_unchanged_import(file_digest, mode='merge'):
+        """
+        Get the last completed import of the workbook with this digest when
+        the tasks table hasn't changed since it finished (importing it
+        again in this mode would change nothing), None otherwise
+        A merge import leaves other rows of the scope that a delta import
+        would remove, so only a previous delta import counts for delta
+        """
+        if not file_digest:
+            return None
+
+        modes = IMPORT_MODES if mode == 'merge' else (mode,)
+        job = ImportJob.query.filter(
+            ImportJob.file_digest == file_digest,
+            ImportJob.status == 'completed',
+            ImportJob.mode.in_(modes)
+        ).order_by(ImportJob.finished_at.desc()).first()
+        if job is not None and job.dataset_stamp == ImportJobService.get_dataset_stamp():
+            return job
+        return None
+
+    @staticmethod
+    def _replay_unchanged(processor, previous, mode='merge'):
+        """Fill processor stats/errors for an unchanged re-upload of previous, nothing is written"""
+        previous_stats = json.loads(previous.stats)
+        for key in new_parse_stats():
+            processor.stats[key] = previous_stats[key]
+
+        if mode == 'delta':
+            duplicates = previous_stats['duplicates_skipped']
+            processor.stats['duplicates_skipped'] = duplicates
+            processor.stats['unchanged_records'] = previous_stats['valid_rows'] - duplicates
+            processor.stats['updated_records'] = 0
+            processor.stats['removed_records'] = 0
+            processor.stats['removals_skipped'] = 0
+        else:
+            # Every valid row is in the table already
+            processor.stats['duplicates_skipped'] = previous_stats['valid_rows']
+        processor.stats['unchanged_since_job'] = previous.id
+        processor.errors = json.loads(previous.errors) if previous.errors else []
+        return processor.stats
+
+    @staticmethod
+    def get_job(job_id):
+        """Get job by id, a stale queued/running job is marked failed first"""
+        job = db.session.get(ImportJob, job_id)
+        if job is not None and ImportJobService._is_stale(job, ImportJobService._stale_cutoff()):
+            ImportJobService._fail_stale(job)
+            db.session.commit()
+        return job
+
+    @staticmethod
+    def _stale_cutoff():
+        """Queued/running jobs created/started before this are considered dead"""
+        return datetime.utcnow() - timedelta(seconds=current_app.config.get('IMPORT_JOB_TIMEOUT', 3600))
+
+    @staticmethod
+    def _is_stale(job, cutoff):
+        if job.status == 'queued':
+            return job.created_at < cutoff
+        if job.status == 'running':
+            return job.started_at < cutoff
+        return False
+
+    @staticmethod
+    def _fail_stale(job):
+        job.status = 'failed'
+        job.error = STALE_JOB_ERROR if job.file_path else LOST_UPLOAD_ERROR
+        job.finished_at = datetime.utcnow()
+
+    @staticmethod
+    def fail_stale_jobs():
+        """
+        Mark jobs queued or running for longer than IMPORT_JOB_TIMEOUT as failed
+        Called on startup, so jobs lost with a restarted worker don't stay
+        queued/running forever (the age keeps jobs of live workers running)
+        Returns number of jobs marked failed
+        """
+        cutoff = ImportJobService._stale_cutoff()
+        jobs = ImportJob.query.filter(or_(
+            and_(ImportJob.status == 'queued', ImportJob.created_at < cutoff),
+            and_(ImportJob.status == 'running', ImportJob.started_at < cutoff)
+        )).all()
+        for job in jobs:
+            ImportJobService._fail_stale(job)
+        db.session.commit()
+        return len(jobs)
+
+    @staticmethod
+    def describe(job):
+        """Convert job to dictionary, with the live progress of a running job"""
+        progress = job_progress.get(job.id) if job.status == 'running' else None
+        return job.to_dict(progress)
+
+    @staticmethod
+    def get_recent_jobs(limit=20):
+        """Get most recently created jobs"""
+        return ImportJob.query.order_by(ImportJob.created_at.desc()).limit(limit).all()
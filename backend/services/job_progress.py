@@ -0,0 +1,90 @@
+"""
+Live progress of running import jobs
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class JobProgressStore:
+    """
+    Progress counters of running import jobs
+    Kept outside the application database, so an import publishes its
+    progress without committing the transaction holding its task writes.
+    With a path the counters live in a small SQLite side database shared
+    by all worker processes on the host, otherwise in a per-process dict
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._local = threading.local()
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure store from application config"""
+        self.path = app.config.get('IMPORT_PROGRESS_PATH')
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            self._ensure_schema()
+
+    def _connect(self):
+        """Get connection for current thread (reopened after fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _ensure_schema(self):
+        """Create progress table if it doesn't exist"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS job_progress ('
+            'job_id TEXT PRIMARY KEY, progress TEXT NOT NULL, updated_at REAL NOT NULL)'
+        )
+
+    def publish(self, job_id, progress):
+        """Store the current progress dictionary of a job"""
+        if not self.path:
+            with self._lock:
+                self._entries[job_id] = dict(progress)
+            return
+
+        self._connect().execute(
+            'INSERT OR REPLACE INTO job_progress (job_id, progress, updated_at) VALUES (?, ?, ?)',
+            (job_id, json.dumps(progress), time.time())
+        )
+
+    def get(self, job_id):
+        """Get the last published progress of a job, None when there is none"""
+        if not self.path:
+            with self._lock:
+                progress = self._entries.get(job_id)
+            return dict(progress) if progress is not None else None
+
+        row = self._connect().execute(
+            'SELECT progress FROM job_progress WHERE job_id = ?', (job_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def discard(self, job_id):
+        """Drop the progress of a finished job"""
+        if not self.path:
+            with self._lock:
+                self._entries.pop(job_id, None)
+            return
+
+        self._connect().execute('DELETE FROM job_progress WHERE job_id = ?', (job_id,))
+
+
+job_progress = JobProgressStore()
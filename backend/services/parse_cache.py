@@ -0,0 +1,144 @@
+"""
+Content-addressed cache of parsed workbooks
+"""
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import date
+
+# Bump when parsing/validation changes so older entries are ignored
+FORMAT_VERSION = 4
+
+
+class ParseCacheWriter:
+    """Write parsed tasks of one workbook incrementally, published on commit"""
+
+    def __init__(self, cache, digest):
+        self.cache = cache
+        self.digest = digest
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.directory, suffix='.tmp')
+        self._file = gzip.open(os.fdopen(fd, 'wb'), 'wt', encoding='utf-8', compresslevel=1)
+
+    def add(self, task):
+        """Append one task dictionary"""
+        warning_date = task['warning_date']
+        self._file.write(json.dumps(
+            [task['stt'], task['department'], task['content'], warning_date.isoformat() if warning_date else None],
+            ensure_ascii=False
+        ))
+        self._file.write('\n')
+
+    def commit(self, stats, errors):
+        """Finish the entry with parse stats and errors and make it visible"""
+        self._file.write(json.dumps({'stats': stats, 'errors': errors}, ensure_ascii=False))
+        self._file.write('\n')
+        self._file.close()
+        os.replace(self.tmp_path, self.cache.get_path(self.digest))
+        self.cache.evict_expired()
+
+    def discard(self):
+        """Drop a partially written entry"""
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class ParseCache:
+    """
+    Parsed, validated rows of uploaded workbooks keyed by the upload's
+    SHA-256 digest, so a preview followed by an import of the same file
+    runs openpyxl once. Entries are gzip-compressed JSON lines (one
+    [stt, department, content, date] array per task and a final stats
+    record) and expire TTL seconds after they were written
+    """
+
+    def __init__(self, directory=None, ttl=86400, enabled=True):
+        self.directory = directory
+        self.ttl = ttl
+        self.enabled = enabled
+
+    def init_app(self, app):
+        """Configure cache from application config"""
+        self.enabled = app.config.get('PARSE_CACHE_ENABLED', True)
+        self.directory = app.config['PARSE_CACHE_DIR']
+        self.ttl = app.config.get('PARSE_CACHE_TTL', self.ttl)
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def get_path(self, digest):
+        """Entry file of a digest"""
+        return os.path.join(self.directory, f'{digest}.v{FORMAT_VERSION}.jsonl.gz')
+
+    def _is_expired(self, path):
+        return time.time() - os.path.getmtime(path) > self.ttl
+
+    def contains(self, digest):
+        """Check for a live entry, dropping it when expired"""
+        if not self.enabled or not digest:
+            return False
+
+        path = self.get_path(digest)
+        try:
+            if self._is_expired(path):
+                os.remove(path)
+                return False
+        except FileNotFoundError:
+            return False
+        return True
+
+    def read(self, digest, stats, errors):
+        """
+        Stream cached task dictionaries of a digest
+        The entry's parse stats are added to stats and its errors appended
+        to errors once all tasks have been read
+        """
+        with gzip.open(self.get_path(digest), 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    for key, value in record['stats'].items():
+                        stats[key] = stats.get(key, 0) + value
+                    errors.extend(record['errors'])
+                    break
+
+                stt, department, content, warning_date = record
+                yield {
+                    'stt': stt,
+                    'department': department,
+                    'content': content,
+                    'warning_date': date.fromisoformat(warning_date) if warning_date else None
+                }
+
+    def writer(self, digest):
+        """Start writing an entry, None when the cache is disabled"""
+        if not self.enabled or not digest:
+            return None
+        return ParseCacheWriter(self, digest)
+
+    def get_stats(self):
+        """Get number and total size of cached workbooks"""
+        if not self.enabled:
+            return {'enabled': False, 'entries': 0, 'size_bytes': 0, 'ttl_seconds': self.ttl}
+
+        paths = [entry.path for entry in os.scandir(self.directory) if entry.name.endswith('.jsonl.gz')]
+        return {
+            'enabled': True,
+            'entries': len(paths),
+            'size_bytes': sum(os.path.getsize(path) for path in paths),
+            'ttl_seconds': self.ttl
+        }
+
+    def evict_expired(self):
+        """Remove expired entries and stale temporary files"""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if self._is_expired(path):
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+parse_cache = ParseCache()
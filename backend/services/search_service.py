@@ -0,0 +1,104 @@
+"""
+Full-text search over task content
+"""
+import re
+from sqlalchemy import column, func, literal, literal_column, table
+from models import Task, db
+from services.cache import cached
+from services.task_service import TaskService, TASK_FIELDS
+from utils.helpers import fold_text
+from utils.serialization import serialize_rows
+
+# Most search terms used from one query
+MAX_SEARCH_TERMS = 10
+
+tasks_fts = table('tasks_fts', column('rowid'))
+
+
+class SearchService:
+    """Ranked, accent-insensitive search using the database full-text index"""
+
+    @staticmethod
+    def parse_terms(query):
+        """
+        Fold the query like the indexed text and split it into terms
+        'Đường dây' and 'duong day' give the same terms
+        """
+        terms = re.findall(r'\w+', fold_text(query or ''))
+        if not terms:
+            raise ValueError('Search query must contain at least one word')
+        return tuple(terms[:MAX_SEARCH_TERMS])
+
+    @staticmethod
+    @cached
+    def search(terms, limit, offset=0, department=None, date_from=None, date_to=None):
+        """
+        Get tasks matching all terms (the last one as a prefix, for search
+        as you type), best match first. terms come from parse_terms.
+        Uses FTS5 (bm25) on SQLite and the tsvector GIN index (ts_rank)
+        on PostgreSQL
+        Returns dictionary: { 'tasks': [... with 'score'], 'next_offset': int or None }
+        """
+        query = TaskService._task_columns_query(TASK_FIELDS, department, date_from, date_to)
+        query, score = SearchService._matching(query, terms)
+
+        rows = query.add_columns(score).order_by(score.desc(), Task.id.asc()).offset(offset).limit(limit + 1).all()
+
+        next_offset = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_offset = offset + limit
+
+        tasks = serialize_rows(rows, TASK_FIELDS + ('score',))
+        for task in tasks:
+            task['score'] = round(float(task['score']), 4)
+
+        return {'tasks': tasks, 'next_offset': next_offset}
+
+    @staticmethod
+    @cached
+    def count(terms, department=None, date_from=None, date_to=None):
+        """Get number of tasks matching all terms, with the filters of search"""
+        query = TaskService._task_columns_query(('id',), department, date_from, date_to)
+        query, _ = SearchService._matching(query, terms)
+        return query.with_entities(func.count(Task.id)).scalar()
+
+    @staticmethod
+    def _matching(query, terms):
+        """
+        Restrict a task query to the tasks matching all terms
+        Returns (query, score expression, higher is better)
+        """
+        dialect = db.engine.dialect.name
+
+        if dialect == 'sqlite':
+            score = -literal_column('tasks_fts.rank')
+            query = query.join(tasks_fts, tasks_fts.c.rowid == Task.id).filter(
+                literal_column('tasks_fts').op('MATCH')(SearchService._fts5_query(terms))
+            )
+        elif dialect == 'postgresql':
+            vector = func.to_tsvector('simple', func.coalesce(Task.search_text, ''))
+            tsquery = func.to_tsquery('simple', SearchService._tsquery(terms))
+            score = func.ts_rank(vector, tsquery)
+            query = query.filter(vector.op('@@')(tsquery))
+        else:
+            # No full-text index, plain substring match
+            score = literal(0.0)
+            for term in terms:
+                query = query.filter(Task.search_text.like(f'%{term}%'))
+
+        return query, score
+
+    @staticmethod
+    def _fts5_query(terms):
+        """FTS5 MATCH expression requiring every term (last one as prefix)"""
+        parts = [f'"{term}"' for term in terms]
+        parts[-1] += '*'
+        return ' AND '.join(parts)
+
+    @staticmethod
+    def _tsquery(terms):
+        """PostgreSQL tsquery requiring every term (last one as prefix)"""
+        parts = list(terms)
+        parts[-1] += ':*'
+        return ' & '.join(parts)
@@ -0,0 +1,303 @@
+"""
+Worksheet parsing shared by ExcelProcessor and the parallel import workers
+Kept free of Flask and database imports so it can run in worker processes
+"""
+import re
+from datetime import date, datetime, timedelta
+from itertools import islice
+from operator import itemgetter
+import openpyxl
+
+# Data starts at row 3 (rows 1-2 are headers)
+FIRST_DATA_ROW = 3
+
+# Keys of the task dictionaries produced from a row
+TASK_COLUMNS = ('stt', 'department', 'content', 'warning_date')
+
+# Rows validated together, column by column
+BLOCK_SIZE = 5000
+
+# Excel serial dates count days from 1899-12-30 (accounting for the
+# 1900 leap year bug), the largest one is 9999-12-31
+EXCEL_EPOCH = date(1899, 12, 30)
+MAX_EXCEL_SERIAL = 2958465
+
+# dd/mm/yyyy, also with '-' or '.' separators
+_DAY_FIRST_DATE = re.compile(r'(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})')
+
+# Serial number stored as text, e.g. '45306'
+_SERIAL_TEXT = re.compile(r'\d+(\.\d+)?')
+
+# Marks a date cell that couldn't be parsed
+INVALID_DATE = object()
+
+# Cell types whose equal values collide as dictionary keys
+_NUMBER_TYPES = frozenset((bool, int, float))
+
+# Cell types of an STT column that needs no parsing
+_INT_CELL_TYPES = frozenset((int, type(None)))
+
+
+def new_parse_stats():
+    """Row counters filled while parsing"""
+    return {'total_rows': 0, 'valid_rows': 0, 'invalid_rows': 0}
+
+
+def error_record(code, message, source=None, row=None, column=None, value=None):
+    """
+    Structured import error
+    Returns dictionary: { 'code', 'message', 'source', 'row', 'column', 'value' }
+    where message is the readable form and row the worksheet row number
+    """
+    return {
+        'code': code,
+        'message': message,
+        'source': source,
+        'row': row,
+        'column': column,
+        'value': None if value is None else str(value)
+    }
+
+
+def parse_date(value):
+    """
+    Parse a date cell: datetime/date values, ISO strings (YYYY-MM-DD),
+    dd/mm/yyyy strings and Excel serial numbers (also given as text)
+    Returns date, None for empty cells, INVALID_DATE otherwise
+    """
+    # Booleans are ints, TRUE would otherwise be serial 1
+    if isinstance(value, bool):
+        return INVALID_DATE
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, (int, float)):
+        return _parse_serial(value)
+    if not isinstance(value, str):
+        return INVALID_DATE
+
+    text = value.strip()
+    if not text:
+        return None
+    try:
+        return datetime.fromisoformat(text).date()
+    except ValueError:
+        pass
+
+    match = _DAY_FIRST_DATE.fullmatch(text)
+    if match:
+        day, month, year = map(int, match.groups())
+        try:
+            return date(year, month, day)
+        except ValueError:
+            pass
+
+    if _SERIAL_TEXT.fullmatch(text):
+        # Same as a numeric cell, where 0 is empty
+        serial = float(text)
+        return _parse_serial(serial) if serial else None
+    return INVALID_DATE
+
+
+def _parse_serial(value):
+    """Date of an Excel serial number"""
+    if 1 <= value <= MAX_EXCEL_SERIAL:
+        return EXCEL_EPOCH + timedelta(days=int(value))
+    return INVALID_DATE
+
+
+def _parse_stt(value):
+    """Integer STT of a cell, None when it isn't a whole number"""
+    # Booleans are ints, TRUE is not STT 1
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    return None
+
+
+def _clean_text(value):
+    """Stripped text of a cell, '' for an empty cell (as when filling down merged cells)"""
+    return str(value).strip() if value else ''
+
+
+def _strip_cell(value):
+    """Strip text cells, blank text is an empty cell (None)"""
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+
+def _forward_fill(values, last):
+    """Replace empty cells with the last non-empty value before them"""
+    return [(last := value) if value else last for value in values]
+
+
+def _map_distinct(convert, values):
+    """
+    Apply convert once per distinct value of a column (dates and merged
+    STT/department repeat a lot)
+    1, 1.0 and True are the same dictionary key, a column mixing those
+    types is converted per (type, value)
+    """
+    distinct = set(values)
+    if not _NUMBER_TYPES.isdisjoint(map(type, distinct)) and len(_NUMBER_TYPES.intersection(map(type, values))) > 1:
+        keys = list(zip(map(type, values), values))
+        memo = {key: convert(key[1]) for key in set(keys)}
+        return list(map(memo.__getitem__, keys))
+    memo = {value: convert(value) for value in distinct}
+    return list(map(memo.__getitem__, values))
+
+
+def iter_sheet_tasks(rows, stats, errors, source=None):
+    """
+    Turn worksheet rows (values only, starting at FIRST_DATA_ROW) into
+    validated task dictionaries
+    Rows are validated in blocks of BLOCK_SIZE, column by column. STT and
+    department cells are merged over item groups, so empty cells take the
+    last seen value. Invalid rows are counted in stats and reported in
+    errors as error_record dictionaries
+    """
+    rows = iter(rows)
+    first_row = FIRST_DATA_ROW
+    carry = (None, None)
+
+    while True:
+        block = list(islice(rows, BLOCK_SIZE))
+        if not block:
+            break
+        tasks, carry = _validate_block(block, first_row, carry, stats, errors, source)
+        first_row += len(block)
+        yield from tasks
+
+
+def _validate_block(block, first_row, carry, stats, errors, source):
+    """
+    Validate a block of rows as columns
+    carry is the (stt, department) forward-filled into the block, returns
+    (tasks, carry for the next block)
+    """
+    stats['total_rows'] += len(block)
+
+    # Read-only worksheets don't pad rows with trailing empty cells
+    width = len(TASK_COLUMNS)
+    if min(map(len, block)) < width:
+        block = [tuple(row) + (None,) * (width - len(row)) for row in block]
+    columns = [list(map(itemgetter(index), block)) for index in range(width)]
+
+    # Blank text cells are empty, also before merged cells are filled down.
+    # Departments are cleaned to text first ('' when empty), parse_date
+    # strips text itself and gives None for an empty date cell
+    stt_types = set(map(type, columns[0]))
+    raw_stt = _map_distinct(_strip_cell, columns[0]) if str in stt_types else columns[0]
+    raw_department = _map_distinct(_clean_text, columns[1])
+    contents = [value.strip() if isinstance(value, str) else '' if value is None else str(value) for value in columns[2]]
+    dates = _map_distinct(parse_date, columns[3])
+
+    # Merged cells: carry the last STT/department down
+    filled_stt = _forward_fill(raw_stt, carry[0])
+    departments = _forward_fill(raw_department, carry[1])
+
+    # A column of whole numbers holds the STTs already
+    stt_types.add(type(carry[0]))
+    stts = filled_stt if stt_types <= _INT_CELL_TYPES else _map_distinct(_parse_stt, filled_stt)
+
+    # Valid rows have content and department and a parsable (or no) date
+    tasks = [
+        {'stt': stt, 'department': department, 'content': content, 'warning_date': warning_date}
+        for stt, department, content, warning_date in zip(stts, departments, contents, dates)
+        if content and department and warning_date is not INVALID_DATE
+    ]
+
+    # Report non-empty rows that failed, with the first failed check
+    invalid = 0
+    if len(tasks) < len(block):
+        prefix = f"{source} " if source else ''
+        rows = zip(contents, departments, dates, raw_stt, raw_department)
+        for offset, (content, department, warning_date, stt, raw) in enumerate(rows):
+            if content and department and warning_date is not INVALID_DATE:
+                continue
+            if not (content or warning_date or stt or raw):
+                # Completely empty row
+                continue
+            row_idx = first_row + offset
+            invalid += 1
+            if not content:
+                errors.append(error_record(
+                    'missing_content', f"{prefix}Row {row_idx}: Missing content", source, row_idx, 'content'
+                ))
+            elif not department:
+                errors.append(error_record(
+                    'missing_department', f"{prefix}Row {row_idx}: Missing department", source, row_idx, 'department'
+                ))
+            else:
+                value = _strip_cell(columns[3][offset])
+                errors.append(error_record(
+                    'invalid_date', f"{prefix}Row {row_idx}: Invalid date '{value}'", source, row_idx, 'warning_date', value
+                ))
+
+    stats['invalid_rows'] += invalid
+    stats['valid_rows'] += len(tasks)
+
+    return tasks, (filled_stt[-1], departments[-1])
+
+
+def list_sheets(file_path):
+    """Get worksheet names of a workbook"""
+    wb = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+
+def parse_sheet(file_path, sheet_name, source=None, max_rows=None):
+    """
+    Parse one worksheet into a batch of normalized tasks
+    Entry point of the parallel import workers, returns a picklable
+    dictionary: { 'source', 'rows', 'errors', 'stats' } where rows are
+    tuples in TASK_COLUMNS order (much cheaper to send back than dicts).
+    The rows are held in memory, so a sheet with more than max_rows
+    valid rows is rejected as a whole (without row errors or stats)
+    """
+    stats = new_parse_stats()
+    errors = []
+    rows = []
+
+    try:
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    except Exception as e:
+        errors.append(error_record(
+            'unreadable_file', f"{source or file_path}: Error reading Excel file: {str(e)}", source or file_path
+        ))
+        return {'source': source, 'rows': rows, 'errors': errors, 'stats': stats}
+
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.active
+        sheet_rows = ws.iter_rows(min_row=FIRST_DATA_ROW, max_col=len(TASK_COLUMNS), values_only=True)
+        tasks = iter_sheet_tasks(sheet_rows, stats, errors, source)
+        if max_rows:
+            tasks = islice(tasks, max_rows + 1)
+        rows.extend(tuple(task[column] for column in TASK_COLUMNS) for task in tasks)
+
+        if max_rows and len(rows) > max_rows:
+            rows = []
+            stats = new_parse_stats()
+            errors = [error_record(
+                'sheet_too_large',
+                f"{source or file_path}: More than {max_rows} rows, split the sheet into smaller workbooks",
+                source or file_path
+            )]
+    except Exception as e:
+        errors.append(error_record('unreadable_sheet', f"{source or file_path}: {str(e)}", source or file_path))
+    finally:
+        wb.close()
+
+    return {'source': source, 'rows': rows, 'errors': errors, 'stats': stats}
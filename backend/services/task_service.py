@@ -1,63 +1,169 @@
 """
 Task business logic service
 """
+import base64
+import json
 from datetime import datetime, date
 from collections import defaultdict
-from models import Task
+from sqlalchemy import func, extract, and_, or_
+from models import Task, TaskDailyCount, db
+from services.cache import cached
+from utils.serialization import serialize_rows, iter_serialized
+
+# Fields clients can request through projection
+TASK_FIELDS = ('id', 'stt', 'department', 'content', 'warning_date', 'created_at', 'updated_at')
 
 
 class TaskService:
     """Service for task-related operations"""
 
     @staticmethod
+    @cached
     def get_all_tasks():
         """Get all tasks"""
-        tasks = Task.query.all()
-        return [task.to_dict() for task in tasks]
+        rows = TaskService._task_columns_query(TASK_FIELDS).all()
+        return serialize_rows(rows, TASK_FIELDS)
+
+    @staticmethod
+    @cached
+    def get_tasks_page(limit, cursor=None, fields=None, department=None,
+                       date_from=None, date_to=None):
+        """
+        Get one page of tasks ordered by (warning_date, id), tasks without
+        a date come first
+        Uses keyset pagination: cursor is the opaque next_cursor of the
+        previous page. fields is a tuple of TASK_FIELDS to return (all by default)
+        Returns dictionary: { 'tasks': [...], 'next_cursor': str or None }
+        """
+        fields = TaskService._check_fields(fields)
+
+        # Always select the keyset columns, even when not projected
+        query = TaskService._task_columns_query(
+            list(dict.fromkeys(fields + ('warning_date', 'id'))),
+            department, date_from, date_to
+        )
+
+        if cursor:
+            last_date, last_id = TaskService._decode_cursor(cursor)
+            if last_date is None:
+                query = query.filter(or_(
+                    Task.warning_date.isnot(None),
+                    and_(Task.warning_date.is_(None), Task.id > last_id)
+                ))
+            else:
+                query = query.filter(or_(
+                    Task.warning_date > last_date,
+                    and_(Task.warning_date == last_date, Task.id > last_id)
+                ))
+
+        # Served by the ix_tasks_*warning_date_id indexes (see _keyset_indexes)
+        rows = query.order_by(
+            Task.warning_date.asc().nulls_first(),
+            Task.id.asc()
+        ).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = TaskService._encode_cursor(rows[-1].warning_date, rows[-1].id)
+
+        # Keyset columns that weren't requested come last and are dropped here
+        return {'tasks': serialize_rows(rows, fields), 'next_cursor': next_cursor}
 
     @staticmethod
+    def iter_tasks(fields=None, department=None, date_from=None, date_to=None,
+                   dated_only=False, batch_size=1000):
+        """
+        Stream tasks ordered by (warning_date, id) for full exports
+        Rows are fetched from the database in batches of batch_size
+        and yielded as dictionaries without building ORM objects.
+        Arguments are validated before the first row is produced
+        """
+        fields = TaskService._check_fields(fields)
+        query = TaskService._task_columns_query(fields, department, date_from, date_to)
+        if dated_only:
+            query = query.filter(Task.warning_date.isnot(None))
+        query = query.order_by(
+            Task.warning_date.asc().nulls_first(),
+            Task.id.asc()
+        ).yield_per(batch_size)
+
+        return iter_serialized(query, fields)
+
+    @staticmethod
+    def _check_fields(fields):
+        """Validate projected fields, defaults to all TASK_FIELDS"""
+        fields = tuple(fields) if fields else TASK_FIELDS
+        unknown = [field for field in fields if field not in TASK_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+
+    @staticmethod
+    def _task_columns_query(fields, department=None, date_from=None, date_to=None):
+        """Build a column-only task query with optional department/date filters"""
+        query = db.session.query(*[getattr(Task, field) for field in fields])
+
+        if department:
+            query = query.filter(Task.department == department)
+        if date_from:
+            query = query.filter(Task.warning_date >= TaskService._parse_date(date_from))
+        if date_to:
+            query = query.filter(Task.warning_date <= TaskService._parse_date(date_to))
+
+        return query
+
+    @staticmethod
+    def _encode_cursor(warning_date, task_id):
+        """Encode keyset position as an opaque cursor"""
+        payload = json.dumps([warning_date.isoformat() if warning_date else None, task_id])
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        """Decode opaque cursor into (warning_date, id)"""
+        try:
+            date_str, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return (TaskService._parse_date(date_str) if date_str else None), int(task_id)
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+
+    @staticmethod
+    def _parse_date(value):
+        """Parse YYYY-MM-DD string into date"""
+        if isinstance(value, date):
+            return value
+        return datetime.strptime(value, '%Y-%m-%d').date()
+
+    @staticmethod
+    @cached
     def get_tasks_by_date(year=None):
         """
         Get tasks grouped by date
         Returns dictionary: { 'YYYY-MM-DD': [task1, task2, ...] }
         """
-        query = Task.query.filter(Task.warning_date.isnot(None))
-
-        if year:
-            start_date = date(year, 1, 1)
-            end_date = date(year, 12, 31)
-            query = query.filter(
-                Task.warning_date >= start_date,
-                Task.warning_date <= end_date
-            )
-
-        tasks = query.all()
+        rows = TaskService._filter_year(TaskService._task_columns_query(TASK_FIELDS), year).all()
 
         # Group by date
         tasks_by_date = defaultdict(list)
-        for task in tasks:
-            date_key = task.warning_date.isoformat()
-            tasks_by_date[date_key].append(task.to_dict())
+        for task in iter_serialized(rows, TASK_FIELDS):
+            tasks_by_date[task['warning_date']].append(task)
 
         return dict(tasks_by_date)
 
     @staticmethod
-    def get_upcoming_tasks(limit=None):
+    def get_upcoming_tasks(limit):
         """
         Get tasks from today onwards, sorted by date
         """
         today = date.today()
 
-        query = Task.query.filter(
+        query = TaskService._task_columns_query(TASK_FIELDS).filter(
             Task.warning_date.isnot(None),
             Task.warning_date >= today
-        ).order_by(Task.warning_date.asc())
-
-        if limit:
-            query = query.limit(limit)
+        ).order_by(Task.warning_date.asc()).limit(limit)
 
-        tasks = query.all()
-        return [task.to_dict() for task in tasks]
+        return serialize_rows(query.all(), TASK_FIELDS)
 
     @staticmethod
     def get_tasks_for_date(target_date):
@@ -65,53 +171,171 @@ class TaskService:
         if isinstance(target_date, str):
             target_date = datetime.strptime(target_date, '%Y-%m-%d').date()
 
-        tasks = Task.query.filter(Task.warning_date == target_date).all()
-        return [task.to_dict() for task in tasks]
+        rows = TaskService._task_columns_query(TASK_FIELDS).filter(
+            Task.warning_date == target_date
+        ).all()
+        return serialize_rows(rows, TASK_FIELDS)
+
+    @staticmethod
+    def _filter_year(query, year=None, column=Task.warning_date):
+        """Restrict a query to rows that have a warning date (in the given year)"""
+        query = query.filter(column.isnot(None))
+
+        if year:
+            query = query.filter(
+                column >= date(year, 1, 1),
+                column <= date(year, 12, 31)
+            )
+
+        return query
 
     @staticmethod
+    @cached
     def get_task_counts_by_date(year=None):
         """
-        Get count of tasks per date
+        Get count of tasks per date (from the task_daily_counts rollup)
         Returns dictionary: { 'YYYY-MM-DD': count }
         """
-        query = Task.query.filter(Task.warning_date.isnot(None))
+        rollup = TaskDailyCount
+        query = db.session.query(rollup.warning_date, func.sum(rollup.count))
+        query = TaskService._filter_year(query, year, rollup.warning_date).group_by(rollup.warning_date)
 
-        if year:
-            start_date = date(year, 1, 1)
-            end_date = date(year, 12, 31)
-            query = query.filter(
-                Task.warning_date >= start_date,
-                Task.warning_date <= end_date
-            )
+        return {warning_date.isoformat(): int(count) for warning_date, count in query.all()}
+
+    @staticmethod
+    @cached
+    def get_task_counts_by_department(year=None):
+        """
+        Get count of tasks per department (from the task_daily_counts rollup)
+        When year is given, only tasks dated in that year are counted,
+        otherwise undated tasks are added from the tasks table
+        Returns dictionary: { 'department': count }
+        """
+        rollup = TaskDailyCount
+        query = db.session.query(rollup.department, func.sum(rollup.count))
+        query = TaskService._filter_year(query, year, rollup.warning_date).group_by(rollup.department)
+        counts = {department: int(count) for department, count in query.all()}
+
+        if not year:
+            undated = db.session.query(Task.department, func.count(Task.id)).filter(
+                Task.warning_date.is_(None)
+            ).group_by(Task.department)
+            for department, count in undated.all():
+                counts[department] = counts.get(department, 0) + count
+
+        return counts
 
-        tasks = query.all()
+    @staticmethod
+    @cached
+    def get_task_counts_by_month(year=None):
+        """
+        Get count of tasks per month (from the task_daily_counts rollup)
+        Returns dictionary: { 'YYYY-MM': count }
+        """
+        rollup = TaskDailyCount
+        year_col = extract('year', rollup.warning_date)
+        month_col = extract('month', rollup.warning_date)
 
-        # Count by date
-        counts = defaultdict(int)
-        for task in tasks:
-            date_key = task.warning_date.isoformat()
-            counts[date_key] += 1
+        query = db.session.query(year_col, month_col, func.sum(rollup.count))
+        query = TaskService._filter_year(query, year, rollup.warning_date).group_by(year_col, month_col)
 
-        return dict(counts)
+        return {
+            f"{int(y):04d}-{int(m):02d}": int(count)
+            for y, m, count in query.all()
+        }
 
     @staticmethod
+    @cached
+    def get_dense_counts(year, by_department=False):
+        """
+        Get task counts for a whole year as a dense day-indexed array
+        Index 0 is January 1st, one entry per day of the year
+        With by_department, also returns one array per department (sorted by name)
+        Returns dictionary: { 'start_date', 'days', 'counts', 'departments', 'department_counts' }
+        """
+        start_date = date(year, 1, 1)
+        days = (date(year + 1, 1, 1) - start_date).days
+
+        rollup = TaskDailyCount
+        query = db.session.query(rollup.warning_date, rollup.department, rollup.count)
+        rows = TaskService._filter_year(query, year, rollup.warning_date).all()
+
+        counts = [0] * days
+        channels = {}
+        for warning_date, department, count in rows:
+            index = (warning_date - start_date).days
+            counts[index] += count
+            if by_department:
+                channels.setdefault(department, [0] * days)[index] += count
+
+        departments = sorted(channels)
+        return {
+            'start_date': start_date.isoformat(),
+            'days': days,
+            'counts': counts,
+            'departments': departments,
+            'department_counts': [channels[department] for department in departments]
+        }
+
+    @staticmethod
+    @cached
+    def count_tasks(department=None, date_from=None, date_to=None):
+        """Get number of tasks, optionally filtered by department/warning date"""
+        query = TaskService._task_columns_query(('id',), department, date_from, date_to)
+        return query.with_entities(func.count(Task.id)).scalar()
+
+    @staticmethod
+    @cached
     def get_departments():
-        """Get list of unique departments"""
+        """Get sorted list of unique departments"""
         result = Task.query.with_entities(Task.department).distinct().all()
-        return [dept[0] for dept in result]
+        # Sorted in Python, database collations order non-ASCII names differently
+        return sorted(dept[0] for dept in result)
 
     @staticmethod
     def get_date_range():
         """Get min and max dates from tasks"""
-        min_date = Task.query.filter(Task.warning_date.isnot(None)).order_by(
-            Task.warning_date.asc()
-        ).first()
+        min_date, max_date = db.session.query(
+            func.min(Task.warning_date),
+            func.max(Task.warning_date)
+        ).one()
 
-        max_date = Task.query.filter(Task.warning_date.isnot(None)).order_by(
-            Task.warning_date.desc()
-        ).first()
+        return {
+            'min_date': min_date.isoformat() if min_date else None,
+            'max_date': max_date.isoformat() if max_date else None
+        }
+
+    @staticmethod
+    @cached
+    def get_dataset_stamp():
+        """
+        Get row count and last modification time of the tasks table
+        Used to build HTTP validators (ETag / Last-Modified)
+        """
+        total_tasks, last_modified = db.session.query(
+            func.count(Task.id),
+            func.max(Task.updated_at)
+        ).one()
+
+        return {
+            'total_tasks': total_tasks,
+            'last_modified': last_modified.isoformat() if last_modified else None
+        }
+
+    @staticmethod
+    @cached
+    def get_stats():
+        """
+        Get general statistics
+        Everything is computed with aggregate queries, no task rows are loaded
+        """
+        total_tasks, total_departments = db.session.query(
+            func.count(Task.id),
+            func.count(Task.department.distinct())
+        ).one()
 
         return {
-            'min_date': min_date.warning_date.isoformat() if min_date else None,
-            'max_date': max_date.warning_date.isoformat() if max_date else None
+            'total_tasks': total_tasks,
+            'total_departments': total_departments,
+            'date_range': TaskService.get_date_range()
         }
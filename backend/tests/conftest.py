@@ -0,0 +1,47 @@
+"""
+Shared pytest fixtures, run from backend/: python -m pytest
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py builds a module-level app on import, keep it off the development database
+os.environ.setdefault('FLASK_ENV', 'testing')
+
+import pytest  # noqa: E402
+from app import create_app  # noqa: E402
+from models import Task, TaskDailyCount, db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """Application on a fresh in-memory database (TestingConfig)"""
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def task(stt, department, content, warning_date=None):
+    """Task dictionary as produced by the Excel parser"""
+    return {'stt': stt, 'department': department, 'content': content, 'warning_date': warning_date}
+
+
+def stored_tasks():
+    """(stt, department, content, warning_date) of every task, ordered by id"""
+    return [
+        (row.stt, row.department, row.content, row.warning_date)
+        for row in Task.query.order_by(Task.id).all()
+    ]
+
+
+def rollup_counts():
+    """Rollup as { (warning_date, department): count }"""
+    return {(row.warning_date, row.department): row.count for row in TaskDailyCount.query.all()}
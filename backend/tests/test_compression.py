@@ -0,0 +1,74 @@
+"""
+Response compression and conditional requests
+"""
+import gzip
+from datetime import date
+from services.excel_processor import ExcelProcessor
+from conftest import task
+
+DENSE_URL = '/api/tasks/counts/dense?year=2026&departments=1&format=binary'
+LAYOUT_HEADERS = ('X-Start-Date', 'X-Days', 'X-Dtype', 'X-Departments')
+
+
+def test_cached_compressed_body_keeps_view_headers(client):
+    ExcelProcessor().merge_tasks([task(1, 'A', 'one', date(2026, 1, 1)), task(2, 'B', 'two', date(2026, 1, 2))])
+
+    first = client.get(DENSE_URL, headers={'Accept-Encoding': 'gzip'})
+    second = client.get(DENSE_URL, headers={'Accept-Encoding': 'gzip'})
+
+    assert first.headers['Content-Encoding'] == second.headers['Content-Encoding'] == 'gzip'
+    for name in LAYOUT_HEADERS:
+        assert second.headers.get(name) is not None
+        assert second.headers[name] == first.headers[name]
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert gzip.decompress(second.data) == gzip.decompress(first.data)
+    assert second.headers['Content-Length'] == str(len(second.data))
+
+
+def test_no_compress_opts_a_view_out(app):
+    from routes.api import conditional
+    from utils.compression import no_compress
+
+    payload = {'data': 'x' * 4096}
+
+    @app.route('/test/plain')
+    def plain():
+        return payload
+
+    @app.route('/test/opted-out')
+    @no_compress
+    def opted_out():
+        return payload
+
+    @app.route('/test/conditional-opted-out')
+    @no_compress
+    @conditional()
+    def conditional_opted_out():
+        return payload
+
+    client = app.test_client()
+    headers = {'Accept-Encoding': 'gzip'}
+    assert client.get('/test/plain', headers=headers).headers.get('Content-Encoding') == 'gzip'
+    for url in ('/test/opted-out', '/test/conditional-opted-out', '/test/conditional-opted-out'):
+        response = client.get(url, headers=headers)
+        assert response.headers.get('Content-Encoding') is None
+        assert response.get_json() == payload
+        assert not response.headers.get('ETag', '').endswith('-gzip"')
+
+
+def test_streamed_exports_are_compressed_on_the_fly(client):
+    tasks = [task(number, 'A', f'task {number}', date(2026, 1, 1 + number % 28)) for number in range(1, 200)]
+    ExcelProcessor().merge_tasks(tasks)
+
+    plain = client.get('/api/tasks?export=json')
+    response = client.get('/api/tasks?export=json', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.is_streamed
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data) == plain.data
+    assert plain.get_json()['total'] == 199
+
+    response = client.get('/api/tasks?export=ndjson', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(gzip.decompress(response.data).splitlines()) == 199
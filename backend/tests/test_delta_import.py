@@ -0,0 +1,149 @@
+"""
+Delta imports (ExcelProcessor.delta_tasks)
+"""
+from datetime import date
+from models import Task, db
+from services.cache import result_cache
+from services.excel_processor import ExcelProcessor
+from conftest import rollup_counts, stored_tasks, task
+
+JAN_1 = date(2026, 1, 1)
+JAN_2 = date(2026, 1, 2)
+JAN_3 = date(2026, 1, 3)
+
+
+def delta(tasks):
+    return ExcelProcessor().delta_tasks(list(tasks))
+
+
+def test_first_import_inserts_every_row(app):
+    stats = delta([task(1, 'A', 'one', JAN_1), task(2, 'A', 'two', JAN_2)])
+
+    assert stats['new_records'] == 2
+    assert stats['updated_records'] == 0
+    assert stats['unchanged_records'] == 0
+    assert stats['removed_records'] == 0
+    assert stored_tasks() == [(1, 'A', 'one', JAN_1), (2, 'A', 'two', JAN_2)]
+
+
+def test_inserted_updated_unchanged_and_removed_rows(app):
+    delta([
+        task(1, 'A', 'kept', JAN_1),
+        task(2, 'A', 'edited', JAN_2),
+        task(3, 'A', 'dropped', JAN_2),
+        task(4, 'A', 'renumbered', JAN_3)
+    ])
+    edited_id = Task.query.filter_by(content='edited').one().id
+
+    stats = delta([
+        task(1, 'A', 'kept', JAN_1),
+        task(2, 'A', 'edited again', JAN_2),
+        task(5, 'A', 'renumbered', JAN_3),
+        task(6, 'A', 'added', JAN_3)
+    ])
+
+    assert stats['unchanged_records'] == 1
+    # New content at the same (stt, department, date) and a changed STT
+    assert stats['updated_records'] == 2
+    assert stats['new_records'] == 1
+    assert stats['removed_records'] == 1
+
+    assert sorted(stored_tasks(), key=lambda row: row[0]) == [
+        (1, 'A', 'kept', JAN_1),
+        (2, 'A', 'edited again', JAN_2),
+        (5, 'A', 'renumbered', JAN_3),
+        (6, 'A', 'added', JAN_3)
+    ]
+    # Updates keep the row
+    updated = db.session.get(Task, edited_id)
+    assert updated.content == 'edited again'
+    assert updated.content_hash == Task.make_content_hash('A', 'edited again', JAN_2)
+
+
+def test_rows_outside_the_scope_are_kept(app):
+    delta([task(1, 'A', 'a', JAN_2), task(1, 'B', 'b', JAN_2), task(2, 'A', 'later', date(2026, 2, 1))])
+
+    stats = delta([task(1, 'A', 'a', JAN_1), task(2, 'A', 'a2', JAN_3)])
+
+    # Department B and the February task are outside the workbook's scope
+    assert stats['removed_records'] == 1
+    assert ('B', 'b') in [(row[1], row[2]) for row in stored_tasks()]
+    assert ('A', 'later') in [(row[1], row[2]) for row in stored_tasks()]
+    assert ('A', 'a') in [(row[1], row[2]) for row in stored_tasks()]
+
+
+def test_undated_rows(app):
+    delta([task(1, 'A', 'undated', None), task(2, 'A', 'dated', JAN_1)])
+
+    # Without undated rows in the workbook, undated tasks are out of scope
+    stats = delta([task(2, 'A', 'dated', JAN_1)])
+    assert stats['removed_records'] == 0
+    assert len(stored_tasks()) == 2
+
+    stats = delta([task(1, 'A', 'undated, edited', None), task(2, 'A', 'dated', JAN_1)])
+    assert stats['updated_records'] == 1
+    assert stats['unchanged_records'] == 1
+    assert (1, 'A', 'undated, edited', None) in stored_tasks()
+
+    stats = delta([task(3, 'A', 'other undated', None), task(2, 'A', 'dated', JAN_1)])
+    assert stats['new_records'] == 1
+    assert stats['removed_records'] == 1
+    assert [row for row in stored_tasks() if row[3] is None] == [(3, 'A', 'other undated', None)]
+
+
+def test_reimport_is_a_no_op(app):
+    tasks = [task(1, 'A', 'one', JAN_1), task(2, 'B', 'two', JAN_2), task(3, 'B', 'three', None)]
+    delta(tasks)
+    before = stored_tasks()
+    version = result_cache.get_version()
+
+    stats = delta(tasks)
+
+    assert stats['unchanged_records'] == 3
+    assert stats['new_records'] == stats['updated_records'] == stats['removed_records'] == 0
+    assert stored_tasks() == before
+    # Nothing changed, cached results stay valid
+    assert result_cache.get_version() == version
+
+
+def test_duplicate_rows_in_the_workbook_are_skipped(app):
+    stats = delta([task(1, 'A', 'same', JAN_1), task(2, 'A', 'same', JAN_1)])
+
+    assert stats['new_records'] == 1
+    assert stats['duplicates_skipped'] == 1
+
+
+def test_rollup_follows_removals(app):
+    delta([
+        task(1, 'A', 'one', JAN_1),
+        task(2, 'A', 'two', JAN_1),
+        task(3, 'B', 'three', JAN_1),
+        task(4, 'A', 'four', JAN_2)
+    ])
+    assert rollup_counts() == {(JAN_1, 'A'): 2, (JAN_1, 'B'): 1, (JAN_2, 'A'): 1}
+
+    delta([task(1, 'A', 'one', JAN_1), task(3, 'B', 'three', JAN_1), task(5, 'B', 'five', JAN_2)])
+
+    # Emptied days disappear from the rollup
+    assert rollup_counts() == {(JAN_1, 'A'): 1, (JAN_1, 'B'): 1, (JAN_2, 'B'): 1}
+
+
+def test_invalid_rows_block_removals(app):
+    delta([task(1, 'A', 'one', JAN_1), task(2, 'A', 'two', JAN_2)])
+
+    processor = ExcelProcessor()
+
+    def parsed_rows():
+        # Row 2 failed validation: the parser counts it and drops it
+        yield task(1, 'A', 'one', JAN_1)
+        processor.stats['invalid_rows'] += 1
+        yield task(3, 'A', 'three', JAN_2)
+
+    stats = processor.delta_tasks(parsed_rows())
+
+    assert stats['removed_records'] == 0
+    assert stats['removals_skipped'] == 1
+    assert stats['new_records'] == 1
+    assert [error['code'] for error in processor.get_errors()] == ['removals_skipped']
+    assert (2, 'A', 'two', JAN_2) in stored_tasks()
+    assert rollup_counts()[(JAN_2, 'A')] == 2
@@ -0,0 +1,67 @@
+"""
+Daily count rollup (TaskDailyCount)
+"""
+from datetime import date
+from models import Task, TaskDailyCount, db
+from services.excel_processor import ExcelProcessor
+from services.task_service import TaskService
+from conftest import rollup_counts, task
+
+JAN_1 = date(2026, 1, 1)
+JAN_2 = date(2026, 1, 2)
+
+
+def test_apply_adds_and_subtracts(app):
+    TaskDailyCount.apply([(JAN_1, 'A'), (JAN_1, 'A'), (JAN_2, 'B'), (None, 'A')])
+    assert rollup_counts() == {(JAN_1, 'A'): 2, (JAN_2, 'B'): 1}
+
+    TaskDailyCount.apply([(JAN_1, 'A'), (JAN_2, 'B')], sign=-1)
+    # Rows dropping to zero are removed
+    assert rollup_counts() == {(JAN_1, 'A'): 1}
+
+
+def test_apply_ignores_undated_rows(app):
+    TaskDailyCount.apply([(None, 'A')])
+    assert rollup_counts() == {}
+
+
+def test_merge_import_keeps_the_rollup_in_step(app):
+    ExcelProcessor(batch_size=2).merge_tasks([
+        task(1, 'A', 'one', JAN_1),
+        task(2, 'A', 'two', JAN_1),
+        task(3, 'B', 'three', JAN_2),
+        task(4, 'B', 'undated')
+    ])
+    # Duplicates aren't inserted and aren't counted
+    ExcelProcessor().merge_tasks([task(1, 'A', 'one', JAN_1), task(5, 'A', 'five', JAN_2)])
+
+    assert rollup_counts() == {(JAN_1, 'A'): 2, (JAN_2, 'B'): 1, (JAN_2, 'A'): 1}
+
+
+def test_rebuild_matches_the_tasks_table(app):
+    ExcelProcessor().merge_tasks([task(1, 'A', 'one', JAN_1), task(2, 'B', 'two', JAN_2), task(3, 'B', 'three')])
+    expected = rollup_counts()
+
+    # Drift the rollup: a stale row and a missing one
+    db.session.execute(TaskDailyCount.__table__.delete().where(TaskDailyCount.department == 'A'))
+    TaskDailyCount.apply([(date(2025, 5, 5), 'C')])
+    db.session.commit()
+
+    TaskDailyCount.rebuild()
+
+    assert rollup_counts() == expected == {(JAN_1, 'A'): 1, (JAN_2, 'B'): 1}
+
+
+def test_counts_read_from_the_rollup_match_the_tasks(app):
+    ExcelProcessor().merge_tasks([
+        task(1, 'A', 'one', JAN_1),
+        task(2, 'B', 'two', JAN_1),
+        task(3, 'B', 'three', JAN_2),
+        task(4, 'B', 'undated')
+    ])
+
+    assert TaskService.get_task_counts_by_date(2026) == {'2026-01-01': 2, '2026-01-02': 1}
+    # All-time department totals include undated tasks
+    assert TaskService.get_task_counts_by_department() == {'A': 1, 'B': 3}
+    assert sum(row.count for row in TaskDailyCount.query.all()) == \
+        Task.query.filter(Task.warning_date.isnot(None)).count()
@@ -0,0 +1,26 @@
+"""
+Full-text search (/api/search)
+"""
+from datetime import date
+from services.excel_processor import ExcelProcessor
+from conftest import task
+
+
+def test_total_counts_every_match_not_the_page(client):
+    ExcelProcessor().merge_tasks(
+        [task(number, 'A', f'Kiểm tra đường dây {number}', date(2026, 1, 1)) for number in range(1, 6)] +
+        [task(6, 'B', 'Đường dây trung thế', date(2026, 1, 2)), task(7, 'B', 'Other work', date(2026, 1, 2))]
+    )
+
+    first = client.get('/api/search?q=duong%20day&limit=4').get_json()
+    assert len(first['tasks']) == 4
+    assert first['next_offset'] == 4
+    assert first['total'] == 6
+
+    last = client.get('/api/search?q=duong%20day&limit=4&offset=4').get_json()
+    assert len(last['tasks']) == 2
+    assert last['next_offset'] is None
+    assert last['total'] == 6
+
+    filtered = client.get('/api/search?q=duong%20day&department=B').get_json()
+    assert filtered['total'] == 1
@@ -0,0 +1,70 @@
+"""
+Worksheet row validation (sheet_parser.iter_sheet_tasks)
+"""
+from datetime import date, datetime
+from services.sheet_parser import iter_sheet_tasks, new_parse_stats
+
+
+def parse(rows):
+    stats = new_parse_stats()
+    errors = []
+    tasks = list(iter_sheet_tasks(rows, stats, errors))
+    return tasks, stats, errors
+
+
+def test_merged_cells_and_date_formats():
+    tasks, stats, errors = parse([
+        (1, ' A ', 'one', datetime(2026, 1, 1, 8, 30)),
+        (None, None, 'two', '2026-01-02'),
+        ('  ', '   ', 'three', '03/01/2026'),
+        (2, 'B', ' four ', 46026),
+        (None, None, 'five', '46027'),
+        (None, None, 'six', None)
+    ])
+
+    assert [(t['stt'], t['department'], t['content'], t['warning_date']) for t in tasks] == [
+        (1, 'A', 'one', date(2026, 1, 1)),
+        (1, 'A', 'two', date(2026, 1, 2)),
+        (1, 'A', 'three', date(2026, 1, 3)),
+        (2, 'B', 'four', date(2026, 1, 4)),
+        (2, 'B', 'five', date(2026, 1, 5)),
+        (2, 'B', 'six', None)
+    ]
+    assert stats == {'total_rows': 6, 'valid_rows': 6, 'invalid_rows': 0}
+    assert errors == []
+
+
+def test_invalid_rows_are_reported():
+    tasks, stats, errors = parse([
+        (1, 'A', 'ok', None),
+        (None, None, None, None),
+        (None, None, '  ', '2026-01-01'),
+        (None, None, 'bad date', '2026-13-01'),
+        (None, None, 'boolean date', True)
+    ])
+
+    assert [t['content'] for t in tasks] == ['ok']
+    # The empty row is skipped, not counted
+    assert stats == {'total_rows': 5, 'valid_rows': 1, 'invalid_rows': 3}
+    assert [(error['code'], error['row']) for error in errors] == [
+        ('missing_content', 5), ('invalid_date', 6), ('invalid_date', 7)
+    ]
+
+
+def test_equal_numbers_of_different_types_are_parsed_apart():
+    tasks, stats, errors = parse([
+        (1, 'A', 'int', 1),
+        (1.0, 'A', 'float', 1.0),
+        (True, 'A', 'bool stt', None),
+        (2, 1, 'numeric department', None),
+        (3, 1.0, 'float department', None)
+    ])
+
+    assert [(t['stt'], t['department'], t['warning_date']) for t in tasks] == [
+        (1, 'A', date(1899, 12, 31)),
+        (1, 'A', date(1899, 12, 31)),
+        (None, 'A', None),
+        (2, '1', None),
+        (3, '1.0', None)
+    ]
+    assert errors == []
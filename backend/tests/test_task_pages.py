@@ -0,0 +1,94 @@
+"""
+Keyset pagination of tasks (TaskService.get_tasks_page, GET /api/tasks)
+"""
+from datetime import date, timedelta
+import pytest
+from services.excel_processor import ExcelProcessor
+from services.task_service import TaskService
+from conftest import task
+
+START = date(2026, 3, 1)
+
+
+@pytest.fixture
+def tasks(app):
+    """23 tasks: 3 undated, the others over 5 days (several per day)"""
+    rows = [task(index, 'A' if index % 2 else 'B', f'task {index}', START + timedelta(days=index % 5))
+            for index in range(20)]
+    rows += [task(100 + index, 'A', f'undated {index}') for index in range(3)]
+    ExcelProcessor().merge_tasks(rows)
+    return rows
+
+
+def walk(limit, **filters):
+    """Follow next_cursor through every page, returns (tasks, number of pages)"""
+    tasks, pages, cursor = [], 0, None
+    while True:
+        page = TaskService.get_tasks_page(limit, cursor=cursor, **filters)
+        tasks.extend(page['tasks'])
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return tasks, pages
+
+
+def order_key(row):
+    return (row['warning_date'] is not None, row['warning_date'] or '', row['id'])
+
+
+@pytest.mark.parametrize('limit', [1, 4, 7, 23, 50])
+def test_pages_cover_every_task_once_in_order(tasks, limit):
+    rows, pages = walk(limit)
+
+    assert len(rows) == len(tasks)
+    assert len({row['id'] for row in rows}) == len(tasks)
+    # Undated tasks first, then by (warning_date, id)
+    assert rows == sorted(rows, key=order_key)
+    assert rows[0]['warning_date'] is None
+    assert pages == max(1, -(-len(tasks) // limit))
+
+
+def test_pages_with_filters(tasks):
+    rows, _ = walk(3, department='A', date_from='2026-03-02', date_to='2026-03-04')
+
+    expected = [row for row in tasks if row['department'] == 'A' and row['warning_date']
+                and date(2026, 3, 2) <= row['warning_date'] <= date(2026, 3, 4)]
+    assert sorted(row['content'] for row in rows) == sorted(row['content'] for row in expected)
+    assert rows == sorted(rows, key=order_key)
+
+
+def test_projected_fields_drop_the_keyset_columns(tasks):
+    page = TaskService.get_tasks_page(5, fields=('content',))
+
+    assert all(list(row) == ['content'] for row in page['tasks'])
+    assert page['next_cursor'] is not None
+
+
+def test_cursor_stays_valid_after_inserts_before_it(tasks):
+    first = TaskService.get_tasks_page(10)
+    ExcelProcessor().merge_tasks([task(500, 'A', 'early', date(2026, 1, 1))])
+
+    rows, _ = walk(10)
+    following = TaskService.get_tasks_page(100, cursor=first['next_cursor'])['tasks']
+
+    # The new task sorts before the cursor, nothing is repeated or skipped after it
+    assert following == rows[11:]
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', '!!!', 'WzEsMl0='])
+def test_invalid_cursor(tasks, cursor):
+    with pytest.raises(ValueError):
+        TaskService.get_tasks_page(5, cursor=cursor)
+
+
+def test_api_pages(client, tasks):
+    first = client.get('/api/tasks?limit=10&fields=id,content').get_json()
+    second = client.get(f"/api/tasks?limit=10&fields=id,content&cursor={first['next_cursor']}").get_json()
+
+    # total counts every matching task, not the page
+    assert first['total'] == second['total'] == len(tasks)
+    assert len(first['tasks']) == len(second['tasks']) == 10
+    assert not {row['id'] for row in first['tasks']} & {row['id'] for row in second['tasks']}
+
+    response = client.get('/api/tasks?cursor=not-a-cursor')
+    assert response.status_code == 400
@@ -0,0 +1,151 @@
+"""
+HTTP response compression (gzip, and brotli when installed)
+"""
+import gzip
+import zlib
+from flask import current_app, request
+from utils.instrumentation import timed
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+
+def no_compress(f):
+    """
+    Decorator opting a view out of response compression
+    Checked by the after_request hook and by @conditional views, which
+    compress (and cache) their bodies themselves
+    """
+    f.compress = False
+    return f
+
+
+def negotiate_encoding(view=None):
+    """
+    Pick the best content encoding accepted by the client
+    Returns 'br', 'gzip' or None (compression disabled, not accepted or
+    the view opted out with no_compress)
+    """
+    if not current_app.config.get('COMPRESS_ENABLED', True):
+        return None
+
+    if view is None:
+        view = current_app.view_functions.get(request.endpoint)
+    if view is not None and not getattr(view, 'compress', True):
+        return None
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def is_compressible(response):
+    """Check if response body should be compressed"""
+    return (
+        response.status_code == 200 and
+        not response.is_streamed and
+        not response.direct_passthrough and
+        'Content-Encoding' not in response.headers and
+        response.mimetype in current_app.config['COMPRESS_MIMETYPES'] and
+        response.content_length is not None and
+        response.content_length >= current_app.config['COMPRESS_MIN_SIZE']
+    )
+
+
+def is_stream_compressible(response):
+    """Check if a streamed response body should be compressed while it is sent"""
+    return (
+        response.status_code == 200 and
+        response.is_streamed and
+        not response.direct_passthrough and
+        'Content-Encoding' not in response.headers and
+        response.mimetype in current_app.config['COMPRESS_MIMETYPES']
+    )
+
+
+def compress(data, encoding):
+    """Compress bytes with the given encoding"""
+    level = current_app.config.get('COMPRESS_LEVEL', 6)
+    with timed('compress'):
+        if encoding == 'br':
+            return brotli.compress(data, quality=min(level, 11))
+        return gzip.compress(data, compresslevel=min(level, 9))
+
+
+def compress_stream(chunks, encoding, level):
+    """
+    Compress a streamed body chunk by chunk
+    Small chunks (e.g. one exported row each) are buffered by the
+    compressor, only complete compressed blocks are yielded
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=min(level, 11))
+        process, finish = compressor.process, compressor.finish
+    else:
+        # wbits 31: deflate in a gzip container
+        compressor = zlib.compressobj(min(level, 9), zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+
+    try:
+        for chunk in chunks:
+            data = process(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        # Closes the view's generator (and its stream_with_context)
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def apply_stream_encoding(response, encoding):
+    """Compress a streamed response while it is sent and set the matching headers"""
+    level = current_app.config.get('COMPRESS_LEVEL', 6)
+    response.response = compress_stream(response.response, encoding, level)
+    return set_encoding_headers(response, encoding)
+
+
+def apply_encoding(response, body, encoding):
+    """Replace response body with an encoded body and set the matching headers"""
+    response.set_data(body)
+    return set_encoding_headers(response, encoding)
+
+
+def set_encoding_headers(response, encoding):
+    """Content-Encoding, Vary and an encoding specific ETag"""
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+
+    # Encoded representations need their own strong ETag
+    etag, weak = response.get_etag()
+    if etag and not etag.endswith(f'-{encoding}'):
+        response.set_etag(f'{etag}-{encoding}', weak)
+
+    return response
+
+
+def init_compression(app):
+    """
+    Compress eligible responses of every endpoint after the request
+    Streamed responses (the exports) are compressed while they are sent
+    """
+    @app.after_request
+    def compress_response(response):
+        if 'Content-Encoding' in response.headers:
+            return response
+
+        if response.mimetype in app.config['COMPRESS_MIMETYPES']:
+            response.vary.add('Accept-Encoding')
+
+        encoding = negotiate_encoding()
+        if encoding and is_compressible(response):
+            apply_encoding(response, compress(response.get_data(), encoding), encoding)
+        elif encoding and is_stream_compressible(response):
+            apply_stream_encoding(response, encoding)
+
+        return response
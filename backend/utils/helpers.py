@@ -1,51 +1,100 @@
 """
 Helper utilities
 """
+import hashlib
 import os
+import re
+import shutil
+import tempfile
+import unicodedata
+import uuid
 from werkzeug.utils import secure_filename
 from flask import current_app
 
+# Combining diacritical marks left after NFD decomposition
+_COMBINING_MARKS = re.compile('[\u0300-\u036f]')
 
-def allowed_file(filename):
+
+def allowed_file(filename, extensions=None):
     """Check if file extension is allowed"""
+    if extensions is None:
+        extensions = current_app.config['ALLOWED_EXTENSIONS']
     return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+           filename.rsplit('.', 1)[1].lower() in extensions
 
 
-def save_uploaded_file(file):
+def spool_upload(file):
     """
-    Save uploaded file to upload folder
-    Returns the file path
+    Copy an uploaded workbook into a file object owned by the caller
+    Uploads up to UPLOAD_SPOOL_MAX_SIZE stay in memory, larger ones roll
+    over to an anonymous temporary file, nothing is written to the upload
+    folder. The request's own stream is closed when the request ends, so
+    background jobs need this copy
+    Returns (file object, SHA-256 hex digest), (None, None) when the file
+    type isn't allowed
     """
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
+    if not file or not allowed_file(file.filename):
+        return None, None
+
+    spool = tempfile.SpooledTemporaryFile(max_size=current_app.config['UPLOAD_SPOOL_MAX_SIZE'])
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.stream.read(64 * 1024), b''):
+        digest.update(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+    return spool, digest.hexdigest()
+
 
-        # Create upload folder if not exists
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
+def file_digest(stream):
+    """SHA-256 hex digest of a seekable binary stream, rewound afterwards"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
 
-        # Generate unique filename if file already exists
-        base_name, extension = os.path.splitext(filename)
-        counter = 1
-        file_path = os.path.join(upload_folder, filename)
 
-        while os.path.exists(file_path):
-            filename = f"{base_name}_{counter}{extension}"
-            file_path = os.path.join(upload_folder, filename)
-            counter += 1
+def save_uploaded_files(files):
+    """
+    Save several uploaded workbooks (or zip archives) into a new directory
+    of the upload folder, used for multi-file imports
+    Returns the directory path, None when a file type isn't allowed
+    """
+    extensions = current_app.config['ALLOWED_EXTENSIONS'] | current_app.config['IMPORT_ARCHIVE_EXTENSIONS']
+    if not files or not all(file and allowed_file(file.filename, extensions) for file in files):
+        return None
+
+    directory = os.path.join(current_app.config['UPLOAD_FOLDER'], f'import_{uuid.uuid4().hex}')
+    os.makedirs(directory)
 
-        file.save(file_path)
-        return file_path
+    for index, file in enumerate(files):
+        # Prefix with the position, several departments may send 'report.xlsx'
+        filename = f'{index:03d}_{secure_filename(file.filename)}'
+        file.save(os.path.join(directory, filename))
 
-    return None
+    return directory
 
 
 def cleanup_file(file_path):
-    """Delete file if it exists"""
+    """Delete file (or upload directory) if it exists"""
     try:
+        if os.path.isdir(file_path):
+            shutil.rmtree(file_path)
+            return True
         if os.path.exists(file_path):
             os.remove(file_path)
             return True
     except Exception as e:
         print(f"Error deleting file {file_path}: {e}")
     return False
+
+
+def fold_text(value):
+    """
+    Lowercase text and strip diacritics, e.g. 'Đường dây' -> 'duong day'
+    Used on both indexed text and search queries for accent-insensitive search
+    """
+    if not value:
+        return ''
+    value = value.lower().replace('đ', 'd')  # đ has no NFD decomposition
+    return _COMBINING_MARKS.sub('', unicodedata.normalize('NFD', value))
@@ -0,0 +1,179 @@
+"""
+Per-request instrumentation (SQL query count/time, serialization time)
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds (ms) of the request latency histogram buckets
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Timings reported in the Server-Timing header besides db and total
+TIMING_NAMES = ('serialize', 'compress')
+
+
+def add_timing(name, seconds):
+    """Add seconds to a named timing of the current request"""
+    if has_request_context() and 'timings' in g:
+        g.timings[name] = g.timings.get(name, 0.0) + seconds
+
+
+def request_elapsed():
+    """
+    Seconds since the current request started, measured once per request
+    Shared by the Server-Timing header, route_metrics and the Prometheus
+    request histogram, so they all report the same duration
+    """
+    if 'request_elapsed' not in g:
+        g.request_elapsed = time.perf_counter() - g.request_started
+    return g.request_elapsed
+
+
+@contextmanager
+def timed(name):
+    """Context manager adding the block's duration to a request timing"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - started)
+
+
+class RouteMetrics:
+    """
+    Per-route latency histograms and query counts for this worker
+    Routes are keyed by method and URL rule, so /api/tasks/date/<date_str>
+    is one route whatever the date
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, duration_ms, queries, db_ms):
+        """Record one finished request"""
+        bucket = bisect_left(LATENCY_BUCKETS_MS, duration_ms)
+
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'queries': 0,
+                    'max_queries': 0,
+                    'db_ms': 0.0,
+                    'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1)
+                }
+
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            entry['queries'] += queries
+            entry['max_queries'] = max(entry['max_queries'], queries)
+            entry['db_ms'] += db_ms
+            entry['buckets'][bucket] += 1
+
+    @staticmethod
+    def _percentile(buckets, count, fraction):
+        """Estimate a percentile as the upper bound of the bucket it falls in"""
+        rank = fraction * count
+        seen = 0
+        for index, bucket_count in enumerate(buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def get_stats(self):
+        """Get per-route statistics, slowest average first"""
+        with self._lock:
+            routes = {route: dict(entry, buckets=list(entry['buckets'])) for route, entry in self._routes.items()}
+
+        stats = []
+        for route, entry in routes.items():
+            count = entry['count']
+            bucket_labels = [f'le_{bound}' for bound in LATENCY_BUCKETS_MS] + ['le_inf']
+            stats.append({
+                'route': route,
+                'count': count,
+                'avg_ms': round(entry['total_ms'] / count, 2),
+                'max_ms': round(entry['max_ms'], 2),
+                'p50_ms': self._percentile(entry['buckets'], count, 0.5),
+                'p95_ms': self._percentile(entry['buckets'], count, 0.95),
+                'avg_queries': round(entry['queries'] / count, 2),
+                'max_queries': entry['max_queries'],
+                'avg_db_ms': round(entry['db_ms'] / count, 2),
+                'histogram': dict(zip(bucket_labels, entry['buckets']))
+            })
+
+        return sorted(stats, key=lambda item: item['avg_ms'], reverse=True)
+
+    def reset(self):
+        """Drop all recorded requests"""
+        with self._lock:
+            self._routes.clear()
+
+
+route_metrics = RouteMetrics()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'timings' in g:
+        conn.info['query_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is not None and has_request_context() and 'timings' in g:
+        g.db_queries += 1
+        g.timings['db'] += time.perf_counter() - started
+
+
+def get_route_name():
+    """Route label of the current request (method and URL rule)"""
+    rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    return f'{request.method} {rule}'
+
+
+def init_instrumentation(app):
+    """
+    Time every request and count its SQL statements
+    Adds a Server-Timing header (db, serialize, compress, total) and
+    records per-route histograms in route_metrics. Streamed bodies are
+    produced after the request finishes, so only their setup is timed
+    """
+    if not app.config.get('INSTRUMENTATION_ENABLED', True):
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.db_queries = 0
+        g.timings = {'db': 0.0}
+
+    @app.after_request
+    def record_request_timings(response):
+        if 'timings' not in g:
+            return response
+
+        total_ms = request_elapsed() * 1000
+        db_ms = g.timings['db'] * 1000
+        route_metrics.record(get_route_name(), total_ms, g.db_queries, db_ms)
+
+        if app.config.get('SERVER_TIMING_ENABLED', True):
+            entries = [f'db;dur={db_ms:.2f};desc="{g.db_queries} queries"']
+            for name in TIMING_NAMES:
+                if name in g.timings:
+                    entries.append(f'{name};dur={g.timings[name] * 1000:.2f}')
+            entries.append(f'total;dur={total_ms:.2f}')
+            response.headers['Server-Timing'] = ', '.join(entries)
+
+        return response
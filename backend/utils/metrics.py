@@ -0,0 +1,430 @@
+"""
+Prometheus metrics shared by all gunicorn workers
+"""
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, request
+from auth import admin_required
+from models import db
+from services.cache import result_cache
+from utils.instrumentation import LATENCY_BUCKETS_MS, request_elapsed
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, files are then merged without a lock
+    fcntl = None
+
+# Request latency histogram buckets (seconds), the route_metrics buckets
+REQUEST_BUCKETS = tuple(bound / 1000 for bound in LATENCY_BUCKETS_MS)
+
+# Import duration histogram buckets (seconds)
+IMPORT_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# Metric name -> (type, help)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by route and status'),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by route'),
+    'http_requests_in_flight': ('gauge', 'HTTP requests currently being handled'),
+    'import_jobs_total': ('counter', 'Finished import jobs by status'),
+    'import_rows_parsed_total': ('counter', 'Excel rows read by imports'),
+    'import_rows_inserted_total': ('counter', 'Tasks inserted by imports'),
+    'import_duplicates_skipped_total': ('counter', 'Duplicate tasks skipped by imports'),
+    'import_invalid_rows_total': ('counter', 'Invalid Excel rows skipped by imports'),
+    'import_duration_seconds': ('histogram', 'Import job duration'),
+    'cache_lookups_total': ('counter', 'Result cache lookups by outcome'),
+    'db_pool_size': ('gauge', 'Configured DB connection pool size'),
+    'db_pool_checked_out': ('gauge', 'DB connections currently in use'),
+    'db_pool_overflow': ('gauge', 'DB connections opened beyond the pool size')
+}
+
+
+# Counters and histograms of exited processes are folded into this file
+ARCHIVE_FILE = 'archived.json'
+LOCK_FILE = 'metrics.lock'
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _read_snapshot(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(path, snapshot):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def _make_snapshot(pid, token, counters, gauges, histograms):
+    """Serializable form of metric dictionaries keyed by (name, labels key)"""
+    return {
+        'pid': pid,
+        'token': token,
+        'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+        'gauges': [[name, dict(labels), value] for (name, labels), value in gauges.items()],
+        'histograms': [
+            [name, dict(labels), dict(histogram, counts=list(histogram['counts']))]
+            for (name, labels), histogram in histograms.items()
+        ]
+    }
+
+
+def _merge_snapshot(snapshot, counters, gauges, histograms):
+    """Add a snapshot's metrics to the dictionaries, gauges are skipped when gauges is None"""
+    for name, labels, value in snapshot['counters']:
+        key = (name, _labels_key(labels))
+        counters[key] = counters.get(key, 0) + value
+
+    if gauges is not None:
+        for name, labels, value in snapshot['gauges']:
+            key = (name, _labels_key(labels))
+            gauges[key] = gauges.get(key, 0) + value
+
+    for name, labels, histogram in snapshot['histograms']:
+        key = (name, _labels_key(labels))
+        merged = histograms.get(key)
+        if merged is None:
+            histograms[key] = {
+                'buckets': histogram['buckets'],
+                'counts': list(histogram['counts']),
+                'sum': histogram['sum'],
+                'count': histogram['count']
+            }
+        else:
+            merged['counts'] = [a + b for a, b in zip(merged['counts'], histogram['counts'])]
+            merged['sum'] += histogram['sum']
+            merged['count'] += histogram['count']
+
+
+def _pid_alive(pid):
+    """Check if a worker process is still running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsStore:
+    """
+    File-backed metrics store for multi-process servers
+    Each process keeps its metrics in memory and writes them to its own
+    <pid>.json file in the metrics directory (at most every flush
+    interval, from a background thread). Collecting reads every file:
+    counters and histograms are summed over all processes, gauges only
+    over processes that are still alive.
+    Files of exited processes are folded into ARCHIVE_FILE and removed
+    when collecting; a process reusing the pid of an exited one (told
+    apart by the token in the file) archives the old file first
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.enabled = False
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._pid = None
+        self._token = None
+        self._claimed = False
+        self._flusher = None
+
+    def configure(self, directory, flush_interval=1.0):
+        """Point the store at a metrics directory"""
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.enabled = True
+
+    def _ensure_process(self):
+        """Reset state inherited over fork and start this process's flusher (lock must be held)"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        self._pid = pid
+        self._token = f'{pid}-{time.time_ns()}'
+        self._claimed = False
+        self._counters.clear()
+        self._gauges.clear()
+        self._histograms.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+
+    def inc(self, name, labels=None, value=1):
+        """Increment a counter"""
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels or {}))
+        with self._lock:
+            self._ensure_process()
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._dirty = True
+
+    def set_gauge(self, name, value, labels=None):
+        """Set a gauge of this process"""
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels or {}))
+        with self._lock:
+            self._ensure_process()
+            self._gauges[key] = value
+            self._dirty = True
+
+    def add_gauge(self, name, value, labels=None):
+        """Add value to a gauge of this process"""
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels or {}))
+        with self._lock:
+            self._ensure_process()
+            self._gauges[key] = self._gauges.get(key, 0) + value
+            self._dirty = True
+
+    def observe(self, name, value, buckets, labels=None):
+        """Record a histogram observation"""
+        if not self.enabled:
+            return
+        key = (name, _labels_key(labels or {}))
+        with self._lock:
+            self._ensure_process()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    'buckets': list(buckets),
+                    'counts': [0] * len(buckets),
+                    'sum': 0.0,
+                    'count': 0
+                }
+            for index, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][index] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+            self._dirty = True
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def flush(self, force=False):
+        """Write this process's metrics to its file"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if not (self._dirty or force) or self._pid != os.getpid():
+                return
+            snapshot = _make_snapshot(self._pid, self._token, self._counters, self._gauges, self._histograms)
+            claimed = self._claimed
+            self._claimed = True
+            self._dirty = False
+
+        path = os.path.join(self.directory, f'{snapshot["pid"]}.json')
+        if claimed:
+            _write_snapshot(path, snapshot)
+            return
+
+        # First write of this process: keep what an exited process with the same pid left
+        with self._file_lock():
+            previous = _read_snapshot(path)
+            if previous is not None and previous.get('token') != snapshot['token']:
+                self._archive(path, previous)
+            _write_snapshot(path, snapshot)
+
+    @contextmanager
+    def _file_lock(self):
+        """Lock the metrics directory against other processes archiving files"""
+        with open(os.path.join(self.directory, LOCK_FILE), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _archive(self, path, snapshot):
+        """Fold counters and histograms of an exited process into the archive, then remove its file"""
+        archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+        counters, histograms = {}, {}
+        for source in (_read_snapshot(archive_path), snapshot):
+            if source is not None:
+                _merge_snapshot(source, counters, None, histograms)
+        _write_snapshot(archive_path, _make_snapshot(None, None, counters, {}, histograms))
+        os.remove(path)
+
+    def collect(self):
+        """Merge the metrics of every process, returns (counters, gauges, histograms)"""
+        self.flush()
+        counters, gauges, histograms = {}, {}, {}
+        archive_path = os.path.join(self.directory, ARCHIVE_FILE)
+
+        with self._file_lock():
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                if path == archive_path:
+                    continue
+                snapshot = _read_snapshot(path)
+                if snapshot is None:
+                    continue
+                if _pid_alive(snapshot['pid']):
+                    _merge_snapshot(snapshot, counters, gauges, histograms)
+                else:
+                    self._archive(path, snapshot)
+
+            archived = _read_snapshot(archive_path)
+            if archived is not None:
+                _merge_snapshot(archived, counters, None, histograms)
+
+        return counters, gauges, histograms
+
+
+metrics = MetricsStore()
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + list(extra or [])
+    if not items:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in items
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """Render all metrics in the Prometheus text exposition format"""
+    counters, gauges, histograms = metrics.collect()
+    lines = []
+
+    for name, (kind, help_text) in METRICS.items():
+        series = {'counter': counters, 'gauge': gauges, 'histogram': histograms}[kind]
+        keys = sorted(key for key in series if key[0] == name)
+        if not keys:
+            continue
+
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+        for key in keys:
+            labels = key[1]
+            if kind != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(series[key])}')
+                continue
+
+            histogram = series[key]
+            cumulative = 0
+            for bound, count in zip(histogram['buckets'], histogram['counts']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", _format_value(float(bound)))])} {cumulative}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {histogram["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram["sum"])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def record_import(stats, duration, status):
+    """Record metrics of a finished import job"""
+    metrics.inc('import_jobs_total', {'status': status})
+    metrics.inc('import_rows_parsed_total', value=stats.get('total_rows', 0))
+    metrics.inc('import_rows_inserted_total', value=stats.get('new_records', 0))
+    metrics.inc('import_duplicates_skipped_total', value=stats.get('duplicates_skipped', 0))
+    metrics.inc('import_invalid_rows_total', value=stats.get('invalid_rows', 0))
+    metrics.observe('import_duration_seconds', duration, IMPORT_BUCKETS)
+
+
+def record_cache_lookups(cache, previous):
+    """Add result cache lookups since the previous snapshot, returns the new snapshot"""
+    current = {outcome: getattr(cache, outcome) for outcome in ('hits', 'shared_hits', 'misses')}
+    for outcome, value in current.items():
+        # Counters restart when the cache is cleared
+        delta = value - previous.get(outcome, 0)
+        if delta < 0:
+            delta = value
+        if delta:
+            metrics.inc('cache_lookups_total', {'outcome': outcome}, delta)
+    return current
+
+
+def record_pool_usage(engine):
+    """Sample DB connection pool usage of this process"""
+    pool = engine.pool
+    for name, method in (('db_pool_size', 'size'), ('db_pool_checked_out', 'checkedout'), ('db_pool_overflow', 'overflow')):
+        if hasattr(pool, method):
+            metrics.set_gauge(name, max(getattr(pool, method)(), 0))
+
+
+def init_metrics(app):
+    """Record request metrics for every endpoint and serve them at /metrics"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    metrics.configure(app.config['METRICS_DIR'], app.config.get('METRICS_FLUSH_INTERVAL', 1.0))
+    cache_snapshot = {}
+
+    @app.before_request
+    def start_request_metrics():
+        # Started by init_instrumentation already unless it is disabled
+        g.setdefault('request_started', time.perf_counter())
+        g.metrics_started = True
+        metrics.add_gauge('http_requests_in_flight', 1)
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'metrics_started' not in g:
+            return response
+
+        nonlocal cache_snapshot
+
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        labels = {'method': request.method, 'route': route}
+        metrics.inc('http_requests_total', dict(labels, status=str(response.status_code)))
+        metrics.observe('http_request_duration_seconds', request_elapsed(), REQUEST_BUCKETS, labels)
+        cache_snapshot = record_cache_lookups(result_cache, cache_snapshot)
+        record_pool_usage(db.engine)
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        if g.pop('metrics_started', None) is not None:
+            metrics.add_gauge('http_requests_in_flight', -1)
+
+    def serve_metrics():
+        return app.response_class(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        # Scrapers authenticate with METRICS_TOKEN, anyone else needs an admin session
+        token = app.config.get('METRICS_TOKEN')
+        # Constant time comparison so the token doesn't leak through timing,
+        # as bytes since compare_digest rejects non-ASCII str
+        authorization = request.headers.get('Authorization', '').encode()
+        if token and hmac.compare_digest(authorization, f'Bearer {token}'.encode()):
+            return serve_metrics()
+        return admin_required(serve_metrics)()
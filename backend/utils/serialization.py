@@ -0,0 +1,79 @@
+"""
+Fast serialization helpers for bulk task responses
+"""
+import json
+from flask.json.provider import DefaultJSONProvider
+from utils.instrumentation import timed
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+# Task fields holding date/datetime values
+DATE_FIELDS = frozenset({'warning_date', 'created_at', 'updated_at'})
+
+# Bound on memoized date strings kept while serializing one result
+_MAX_MEMO = 10000
+
+
+def iter_serialized(rows, fields):
+    """
+    Turn column tuples (in fields order) into JSON-ready dictionaries
+    Each distinct date/datetime is formatted with isoformat() only once
+    """
+    memo = {}
+    date_positions = [index for index, field in enumerate(fields) if field in DATE_FIELDS]
+
+    for row in rows:
+        values = list(row)
+        for index in date_positions:
+            value = values[index]
+            if value is not None:
+                text = memo.get(value)
+                if text is None:
+                    if len(memo) >= _MAX_MEMO:
+                        memo.clear()
+                    text = memo[value] = value.isoformat()
+                values[index] = text
+        yield dict(zip(fields, values))
+
+
+def serialize_rows(rows, fields):
+    """List version of iter_serialized"""
+    return list(iter_serialized(rows, fields))
+
+
+def dumps(obj):
+    """Compact JSON encoding, using orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider encoding with orjson when it is installed
+    Output matches the default provider (sorted keys, HTTP dates for
+    date values); without orjson it is the default provider
+    """
+
+    def _orjson_options(self):
+        options = orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options()).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        with timed('serialize'):
+            if orjson is None:
+                return super().response(*args, **kwargs)
+
+            obj = self._prepare_response_obj(args, kwargs)
+            body = orjson.dumps(obj, default=self.default, option=self._orjson_options())
+            return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,58 @@
+"""
+Streaming response helpers
+"""
+from flask import Response, stream_with_context
+from utils.serialization import dumps as _dumps
+
+
+def ndjson_response(rows):
+    """Stream rows as newline delimited JSON, one object per line"""
+    def generate():
+        for row in rows:
+            yield _dumps(row) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def json_list_response(key, rows, extra=None):
+    """
+    Stream { "success": true, "<key>": [rows...], "total": N } incrementally
+    Rows are written as they are produced, total is appended at the end
+    """
+    def generate():
+        header = {'success': True}
+        header.update(extra or {})
+        yield _dumps(header)[:-1] + f',{_dumps(key)}:['
+
+        total = 0
+        for row in rows:
+            yield (',' if total else '') + _dumps(row)
+            total += 1
+
+        yield f'],"total":{total}}}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def json_grouped_response(key, groups, count_key):
+    """
+    Stream { "success": true, "<key>": { group: [rows...] }, "<count_key>": N }
+    groups yields (group_key, row) pairs already ordered by group_key
+    """
+    def generate():
+        yield f'{{"success":true,{_dumps(key)}:{{'
+
+        current = None
+        total_groups = 0
+        for group_key, row in groups:
+            if group_key != current:
+                yield (']' if total_groups else '') + (',' if total_groups else '') + f'{_dumps(group_key)}:['
+                current = group_key
+                total_groups += 1
+                yield _dumps(row)
+            else:
+                yield ',' + _dumps(row)
+
+        yield (']' if total_groups else '') + f'}},{_dumps(count_key)}:{total_groups}}}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -0,0 +1,9 @@
+"""
+WSGI entry point (gunicorn wsgi:app)
+The application is built here and not in app.py, whose module body the
+import parse workers run again
+"""
+import os
+from app import config_name, create_app
+
+app = create_app(config_name, check_schema=os.environ.get('SCHEMA_CHECK', 'true').lower() == 'true')
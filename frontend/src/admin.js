@@ -4,8 +4,12 @@
 import { api } from './utils/api.js';
 import { FileUpload } from './components/FileUpload.js';
 import { formatDateVN } from './utils/dateUtils.js';
+import { escapeHtml } from './utils/htmlUtils.js';
 import './styles/main.scss';
 
+// Give up polling an import job after this long (the server fails it after IMPORT_JOB_TIMEOUT)
+const IMPORT_MAX_WAIT_MS = 60 * 60 * 1000;
+
 class AdminApp {
   constructor() {
     this.fileUpload = null;
@@ -195,9 +199,9 @@ class AdminApp {
 
       preview.sample_tasks.forEach(task => {
         html += '<tr>';
-        html += `<td>${task.stt || '-'}</td>`;
-        html += `<td>${task.department}</td>`;
-        html += `<td>${task.content}</td>`;
+        html += `<td>${escapeHtml(task.stt || '-')}</td>`;
+        html += `<td>${escapeHtml(task.department)}</td>`;
+        html += `<td>${escapeHtml(task.content)}</td>`;
         html += `<td>${task.warning_date ? formatDateVN(task.warning_date) : '-'}</td>`;
         html += '</tr>';
       });
@@ -212,7 +216,7 @@ class AdminApp {
       html += '<h4>⚠️ Cảnh báo:</h4>';
       html += '<ul>';
       errors.forEach(error => {
-        html += `<li>${error}</li>`;
+        html += `<li>${escapeHtml(error.message || error)}</li>`;
       });
       html += '</ul>';
       html += '</div>';
@@ -240,14 +244,17 @@ class AdminApp {
       this.showLoading('Đang import dữ liệu...');
 
       const response = await api.importExcel(this.selectedFile);
+      const job = response.success && response.job
+        ? await this.waitForImportJob(response.job)
+        : null;
 
       this.hideLoading();
 
-      if (response.success) {
-        this.displayImportResult(response.stats, response.errors);
+      if (job && job.status === 'completed') {
+        this.displayImportResult(job.stats, job.errors);
         await this.loadStats(); // Reload stats
       } else {
-        alert('Lỗi: ' + (response.error || 'Import thất bại'));
+        alert('Lỗi: ' + ((job && job.error) || response.error || 'Import thất bại'));
       }
     } catch (error) {
       this.hideLoading();
@@ -255,6 +262,21 @@ class AdminApp {
     }
   }
 
+  async waitForImportJob(job) {
+    // Poll the background import job until it finishes, at most IMPORT_MAX_WAIT_MS
+    const deadline = Date.now() + IMPORT_MAX_WAIT_MS;
+    while (job.status === 'queued' || job.status === 'running') {
+      if (Date.now() > deadline) {
+        throw new Error('Import chưa hoàn tất sau thời gian chờ tối đa, vui lòng kiểm tra lại sau');
+      }
+      this.showLoading(`Đang import dữ liệu... (${job.progress.rows_parsed} dòng đã xử lý)`);
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      const response = await api.getImportJob(job.id);
+      job = response.job;
+    }
+    return job;
+  }
+
   displayImportResult(stats, errors) {
     const resultSection = document.getElementById('result-section');
     const resultTitle = document.getElementById('result-title');
@@ -275,7 +297,7 @@ class AdminApp {
       html += '<h4>⚠️ Các lỗi trong quá trình import:</h4>';
       html += '<ul>';
       errors.slice(0, 10).forEach(error => {
-        html += `<li>${error}</li>`;
+        html += `<li>${escapeHtml(error.message || error)}</li>`;
       });
       if (errors.length > 10) {
         html += `<li>... và ${errors.length - 10} lỗi khác</li>`;
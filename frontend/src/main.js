@@ -56,7 +56,7 @@ class Dashboard {
   async loadData() {
     try {
       // Fetch tasks from API
-      const response = await api.getTasks();
+      const response = await api.getAllTasks();
 
       if (response.tasks && Array.isArray(response.tasks)) {
         rawData = response.tasks;
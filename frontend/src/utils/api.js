@@ -13,6 +13,7 @@ class ApiClient {
     const url = `${this.baseUrl}${endpoint}`;
     const config = {
       credentials: 'include', // Include cookies for session
+      cache: 'no-cache', // Revalidate with ETag, unchanged data comes back as 304
       headers: {
         'Content-Type': 'application/json',
         ...options.headers
@@ -35,9 +36,31 @@ class ApiClient {
     }
   }
 
+  async requestBinary(endpoint) {
+    const url = `${this.baseUrl}${endpoint}`;
+    const response = await fetch(url, { credentials: 'include', cache: 'no-cache' });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return { buffer: await response.arrayBuffer(), headers: response.headers };
+  }
+
   // Task endpoints
-  async getTasks() {
-    return this.request('/api/tasks');
+  async getTasks(params = {}) {
+    const query = new URLSearchParams(params).toString();
+    return this.request(`/api/tasks${query ? `?${query}` : ''}`);
+  }
+
+  async getAllTasks(params = {}) {
+    // One streamed export instead of a request per page, with only the
+    // fields the dashboard renders unless others are asked for
+    return this.getTasks({
+      fields: 'department,content,warning_date',
+      ...params,
+      export: 'json'
+    });
   }
 
   async getTasksByDate(year = null) {
@@ -50,6 +73,26 @@ class ApiClient {
     return this.request(`/api/tasks/counts${query}`);
   }
 
+  async getDenseTaskCounts(year, byDepartment = false) {
+    // Day-indexed counts: total[0] is January 1st of the year, the
+    // department channels follow the total in the buffer
+    const query = `?year=${year}&format=binary${byDepartment ? '&departments=1' : ''}`;
+    const { buffer, headers } = await this.requestBinary(`/api/tasks/counts/dense${query}`);
+
+    const days = parseInt(headers.get('X-Days'), 10);
+    const ArrayType = headers.get('X-Dtype') === 'uint32' ? Uint32Array : Uint16Array;
+    const values = new ArrayType(buffer);
+    const header = headers.get('X-Departments');
+    const names = header ? header.split(',').map(decodeURIComponent) : [];
+
+    const departments = {};
+    names.forEach((name, index) => {
+      departments[name] = values.subarray((index + 1) * days, (index + 2) * days);
+    });
+
+    return { startDate: headers.get('X-Start-Date'), days, total: values.subarray(0, days), departments };
+  }
+
   async getUpcomingTasks(limit = null) {
     const query = limit ? `?limit=${limit}` : '';
     return this.request(`/api/tasks/upcoming${query}`);
@@ -67,6 +110,12 @@ class ApiClient {
     return this.request('/api/stats');
   }
 
+  async batch(queries) {
+    // queries: [{ type: 'counts', year: 2026 }, { type: 'stats' }, ...]
+    const q = queries.map(({ type, year }) => (year ? `${type}:${year}` : type)).join(',');
+    return this.request(`/api/batch?q=${encodeURIComponent(q)}`);
+  }
+
   // Admin endpoints
   async login(username, password) {
     return this.request('/api/admin/login', {
@@ -96,6 +145,10 @@ class ApiClient {
     });
   }
 
+  async getImportJob(jobId) {
+    return this.request(`/api/admin/import/jobs/${jobId}`);
+  }
+
   async previewExcel(file) {
     const formData = new FormData();
     formData.append('file', file);
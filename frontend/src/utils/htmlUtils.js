@@ -0,0 +1,18 @@
+/**
+ * HTML utility functions
+ */
+
+const HTML_ESCAPES = {
+  '&': '&amp;',
+  '<': '&lt;',
+  '>': '&gt;',
+  '"': '&quot;',
+  "'": '&#39;'
+};
+
+/**
+ * Escape text (e.g. cell values from an uploaded workbook) for use in innerHTML
+ */
+export function escapeHtml(value) {
+  return String(value ?? '').replace(/[&<>"']/g, char => HTML_ESCAPES[char]);
+}
@@ -44,7 +44,7 @@ fi
 
 echo "Testing backend import and config..."
 FLASK_ENV=production python -c "
-from app import app
+from wsgi import app
 print('✅ Backend loads successfully!')
 print(f'Debug mode: {app.debug}')
 print(f'Testing mode: {app.testing}')